@@ -0,0 +1,217 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import storage
+from instrumentation import MetricsRecorder
+
+metrics = MetricsRecorder('accuracy')
+
+join_db_path = 'join_pred.db'
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DAILY_TABLE = 'accuracy_daily'
+SUMMARY_TABLE = 'prediction_accuracy'
+CHECKPOINT_TABLE = 'accuracy_checkpoints'
+# Rolling windows in calendar days ending at a ticker's latest joined bar; None is all history
+WINDOWS = {'1d': 1, '1w': 7, 'all': None}
+SUMS = ['n', 'sum_error', 'sum_abs_error', 'sum_squared_error', 'direction_n', 'direction_hits']
+
+
+def create_tables(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {DAILY_TABLE} (table_name TEXT NOT NULL, date TEXT NOT NULL, field TEXT NOT NULL, "
+        "n INTEGER, sum_error REAL, sum_abs_error REAL, sum_squared_error REAL, direction_n INTEGER, direction_hits INTEGER, "
+        "PRIMARY KEY (table_name, date, field));"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (table_name TEXT NOT NULL, field TEXT NOT NULL, window TEXT NOT NULL, "
+        "n INTEGER, mae REAL, rmse REAL, bias REAL, hit_rate REAL, last_datetime TEXT, updated_at TEXT, "
+        "PRIMARY KEY (table_name, field, window));"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (table_name TEXT PRIMARY KEY, last_datetime TEXT, "
+        "signature TEXT, rows INTEGER);"
+    )
+
+
+def row_at(conn, joined_table, datetime):
+    """Text fingerprint of the joined row at a Datetime, to notice a rebuilt table."""
+    return repr(conn.execute(f'SELECT * FROM "{joined_table}" WHERE Datetime=?;', (datetime,)).fetchone())
+
+
+def read_new_rows(conn, joined_table, fields, after=None):
+    """
+    Read joined rows from the checkpoint Datetime onwards through the Datetime
+    index. The row at the checkpoint itself is included as context for the
+    first new bar's direction.
+    """
+    columns = ', '.join(f'"{f}", "Predicted_{f}"' for f in fields)
+    query = f'SELECT Datetime, {columns} FROM "{joined_table}"'
+    params = ()
+    if after is not None:
+        query += ' WHERE Datetime >= ?'
+        params = (after,)
+    return pd.read_sql(query + ' ORDER BY Datetime;', conn, params=params)
+
+
+def daily_sums(rows, fields, has_context):
+    """
+    Aggregate errors (predicted minus actual) and direction hits of new joined
+    rows per trading day and field.
+    A direction hit is a bar where the prediction and the actual bar moved the
+    same way from the previous actual bar.
+    Args:
+        rows (pd.DataFrame): Joined rows ordered by Datetime.
+        fields (list): Fields with a Predicted_ column.
+        has_context (bool): The first row was already counted and only provides
+            the previous actual value.
+    Returns:
+        pd.DataFrame: One row per (date, field) with the SUMS columns.
+    """
+    dates = rows['Datetime'].str[:10]
+    frames = []
+    for field in fields:
+        actual = rows[field].astype(float)
+        predicted = rows[f'Predicted_{field}'].astype(float)
+        previous = actual.shift(1)
+        error = predicted - actual
+        direction = previous.notna() & actual.notna() & predicted.notna()
+        frame = pd.DataFrame({
+            'date': dates,
+            'n': error.notna().astype(int),
+            'sum_error': error.fillna(0),
+            'sum_abs_error': error.abs().fillna(0),
+            'sum_squared_error': (error ** 2).fillna(0),
+            'direction_n': direction.astype(int),
+            'direction_hits': (direction & (np.sign(predicted - previous) == np.sign(actual - previous))).astype(int),
+        })
+        if has_context:
+            frame = frame.iloc[1:]
+        frames.append(frame.groupby('date', as_index=False).sum().assign(field=field))
+    return pd.concat(frames, ignore_index=True)
+
+
+def add_daily_sums(conn, table_name, sums):
+    """Add new per-day sums onto the stored ones. Runs inside the caller's transaction."""
+    names = ', '.join(SUMS)
+    conn.executemany(
+        f"INSERT INTO {DAILY_TABLE} (table_name, date, field, {names}) VALUES (?, ?, ?, {', '.join('?' for _ in SUMS)}) "
+        f"ON CONFLICT(table_name, date, field) DO UPDATE SET {', '.join(f'{s}={s}+excluded.{s}' for s in SUMS)};",
+        [(table_name, date, field, *(int(v) if s in ('n', 'direction_n', 'direction_hits') else float(v)
+                                      for s, v in zip(SUMS, values)))
+         for date, field, *values in sums[['date', 'field'] + SUMS].itertuples(index=False, name=None)],
+    )
+
+
+def refresh_summary(conn, table_name, last_datetime):
+    """
+    Recompute a ticker's rolling-window metrics from its per-day sums, which
+    is a scan of a few rows per trading day rather than of the joined table.
+    Runs inside the caller's transaction.
+    """
+    daily = pd.read_sql(f"SELECT date, field, {', '.join(SUMS)} FROM {DAILY_TABLE} WHERE table_name=?;",
+                        conn, params=(table_name,))
+    daily['date'] = pd.to_datetime(daily['date'])
+    last_date = pd.Timestamp(last_datetime).normalize()
+    updated_at = time.strftime(storage.DATETIME_FORMAT)
+    rows = []
+    for window, days in WINDOWS.items():
+        in_window = daily if days is None else daily[daily['date'] > last_date - pd.Timedelta(days=days)]
+        for field, sums in in_window.groupby('field')[SUMS].sum().iterrows():
+            n, direction_n = int(sums['n']), int(sums['direction_n'])
+            rows.append((
+                table_name, field, window, n,
+                sums['sum_abs_error'] / n if n else None,
+                float(np.sqrt(sums['sum_squared_error'] / n)) if n else None,
+                sums['sum_error'] / n if n else None,
+                sums['direction_hits'] / direction_n if direction_n else None,
+                last_datetime, updated_at,
+            ))
+    conn.execute(f"DELETE FROM {SUMMARY_TABLE} WHERE table_name=?;", (table_name,))
+    conn.executemany(f"INSERT INTO {SUMMARY_TABLE} VALUES ({', '.join('?' for _ in range(10))});", rows)
+
+
+def update_accuracy(join_db_path, full_rebuild=False):
+    """
+    Bring the accuracy metrics of every <ticker>_joined table up to date.
+    Only rows joined after each table's checkpoint Datetime are read; their
+    sums are added to per-day aggregates in accuracy_daily, from which
+    prediction_accuracy (MAE, RMSE, bias and directional hit rate per field
+    over the last day, last week and all history) is recomputed.
+    A ticker starts over when full_rebuild is set or its joined table was
+    rebuilt. Joined rows updated in place at or before the checkpoint are only
+    picked up by a full rebuild.
+    Args:
+        join_db_path (str): Database with the joined tables, e.g. join_pred.db.
+        full_rebuild (bool): Recompute every ticker from all joined rows.
+    Returns:
+        dict: Table name to the number of new rows scored.
+    """
+    conn = storage.connect(join_db_path)
+    create_tables(conn)
+    results = {}
+    for joined_table in storage.list_tables(conn, suffix='_joined'):
+        table_name = joined_table[:-len('_joined')]
+        columns = {name for (_, name, *_) in conn.execute(f'PRAGMA table_info("{joined_table}");')}
+        fields = [f for f in FIELDS if f in columns and f'Predicted_{f}' in columns]
+        checkpoint = None if full_rebuild else conn.execute(
+            f"SELECT last_datetime, signature, rows FROM {CHECKPOINT_TABLE} WHERE table_name=?;", (table_name,)
+        ).fetchone()
+        if checkpoint is not None and row_at(conn, joined_table, checkpoint[0]) != checkpoint[1]:
+            checkpoint = None
+
+        with metrics.stage('rebuild' if checkpoint is None else 'update', ticker=table_name) as m, conn:
+            rows = read_new_rows(conn, joined_table, fields, None if checkpoint is None else checkpoint[0])
+            new_rows = len(rows) - (checkpoint is not None)
+            m['rows'] = results[table_name] = new_rows
+            if new_rows == 0:
+                continue
+            conn.execute("BEGIN;")
+            if checkpoint is None:
+                conn.execute(f"DELETE FROM {DAILY_TABLE} WHERE table_name=?;", (table_name,))
+            add_daily_sums(conn, table_name, daily_sums(rows, fields, has_context=checkpoint is not None))
+            last_datetime = rows['Datetime'].iloc[-1]
+            refresh_summary(conn, table_name, last_datetime)
+            conn.execute(
+                f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} VALUES (?, ?, ?, ?);",
+                (table_name, last_datetime, row_at(conn, joined_table, last_datetime),
+                 new_rows + (0 if checkpoint is None else checkpoint[2])),
+            )
+    conn.close()
+    metrics.flush()
+    return results
+
+
+def read_accuracy(db_path=join_db_path, window=None):
+    """
+    Read the precomputed accuracy metrics.
+    Args:
+        db_path (str): Database holding prediction_accuracy.
+        window (str): Only return one window ('1d', '1w' or 'all').
+    Returns:
+        pd.DataFrame: Metrics rows, empty if they were never computed.
+    """
+    if not os.path.exists(db_path):
+        return pd.DataFrame()
+    conn = storage.connect(db_path, read_only=True)
+    try:
+        if SUMMARY_TABLE not in storage.list_tables(conn):
+            return pd.DataFrame()
+        query, params = f"SELECT * FROM {SUMMARY_TABLE}", ()
+        if window is not None:
+            query, params = query + " WHERE window=?", (window,)
+        return pd.read_sql(query + " ORDER BY table_name, window, field;", conn, params=params)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Update rolling prediction accuracy metrics from the joined tables.")
+    parser.add_argument('--database', default=join_db_path)
+    parser.add_argument('--full-rebuild', action='store_true', help="Recompute every ticker from all joined rows.")
+    args = parser.parse_args()
+    for table, rows in update_accuracy(args.database, full_rebuild=args.full_rebuild).items():
+        print(f"{table}: {rows} new rows scored")
@@ -1,7 +1,15 @@
-from flask import Flask, request, render_template
-import sqlite3
+from flask import Flask, request, render_template, jsonify
+import os
+import re
+import time
+from collections import deque
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+import storage
+from market_calendar import future_session_times
+from model_cache import ModelCache, forecast_window
+from downsampling import downsample_ohlc
 
 app = Flask(__name__)
 
@@ -12,21 +20,24 @@ prediction_db_path = 'predictions/predictions.db'
 # Output directory
 output_html_path = 'charts/candlestick_charts.html'
 
+input_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+n_steps = 12
+
+# Models stay loaded between requests; size the cache with MODEL_CACHE_SIZE
+model_cache = ModelCache(max_size=int(os.environ.get('MODEL_CACHE_SIZE', 8)))
+# Recent forecast latencies in seconds, for the /api/latency report
+forecast_latencies = deque(maxlen=1000)
+
 # Function to load and process data from a database
 def load_and_process_data(db_path, table_name):
-    with sqlite3.connect(db_path) as conn:
-        # Load data from the table
-        data = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-
-    # Drop duplicate rows based on the Datetime column, keeping the last occurrence
-    data = data.drop_duplicates(subset=['Datetime'], keep='last')
+    conn = storage.connect(db_path, read_only=True)
+    # Load the last 120 Datetimes, keeping the last written row for each
+    data = storage.read_latest(conn, table_name, 120, one_per_datetime=True)
+    conn.close()
 
     # Sort data by Datetime to maintain order
     data['Datetime'] = pd.to_datetime(data['Datetime'])  # Ensure Datetime is in datetime format
-    data = data.sort_values(by='Datetime')
-
-    # Select the last 120 rows
-    return data.tail(120)
+    return data.sort_values(by='Datetime')
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -71,5 +82,138 @@ def index():
 
     return render_template("index.html")
 
+def load_latest_window(table_name):
+    """
+    Load the latest n_steps distinct bars of a ticker.
+    Returns:
+        tuple: Raw OHLCV window of shape (n_steps, F) and the Datetime of its last bar,
+            or (None, None) if the ticker table does not exist.
+    """
+    conn = storage.connect(nifty50_db_path, read_only=True)
+    if table_name not in storage.list_tables(conn):
+        conn.close()
+        return None, None
+    data = storage.read_latest(conn, table_name, 2 * n_steps)
+    conn.close()
+
+    data['Datetime'] = pd.to_datetime(data['Datetime'], errors='coerce').dt.tz_localize(None)
+    data = data.dropna(subset=['Datetime']).drop_duplicates(subset=['Datetime']).sort_values('Datetime').tail(n_steps)
+    return data[input_columns].to_numpy(dtype=np.float64), data['Datetime'].iloc[-1] if len(data) else None
+
+@app.route("/api/forecast/<table_name>", methods=["GET", "POST"])
+def forecast(table_name):
+    """
+    Forecast the next n_future bars for a ticker.
+    By default the window is the ticker's latest n_steps bars; a POST body of
+    {"window": [[Open, High, Low, Close, Volume], ...], "last_datetime": "..."}
+    forecasts from the given window instead.
+    """
+    start = time.perf_counter()
+    if not re.fullmatch(r'\w+', table_name):
+        return jsonify(error="invalid ticker"), 400
+
+    body = request.get_json(silent=True) or {}
+    if 'window' in body:
+        try:
+            window = np.asarray(body['window'], dtype=np.float64)
+            last_datetime = pd.Timestamp(body['last_datetime']) if body.get('last_datetime') else None
+            if last_datetime is pd.NaT:
+                raise ValueError("last_datetime is not a datetime")
+            if last_datetime is not None and last_datetime.tz is not None:
+                # Keep the wall-clock time, as stored bars carry it
+                last_datetime = last_datetime.tz_localize(None)
+        except (ValueError, TypeError) as e:
+            return jsonify(error=str(e)), 400
+    else:
+        window, last_datetime = load_latest_window(table_name)
+        if window is None:
+            return jsonify(error=f"unknown ticker {table_name}"), 404
+
+    if window.shape != (n_steps, len(input_columns)):
+        return jsonify(error=f"window must have shape ({n_steps}, {len(input_columns)})"), 400
+
+    try:
+        loaded = model_cache.get(table_name)
+    except FileNotFoundError:
+        return jsonify(error=f"no model for {table_name}"), 404
+
+    values = forecast_window(loaded, window)
+    forecasts = [dict(zip(input_columns, row.tolist())) for row in values]
+    if last_datetime is not None:
+        for row, when in zip(forecasts, future_session_times([last_datetime], len(values))[0]):
+            row['Datetime'] = pd.Timestamp(when).strftime(storage.DATETIME_FORMAT)
+
+    elapsed = time.perf_counter() - start
+    forecast_latencies.append(elapsed)
+    return jsonify(ticker=table_name, forecasts=forecasts, latency_ms=round(elapsed * 1000, 2))
+
+@app.route("/api/latency")
+def latency():
+    """Report forecast latency percentiles over the most recent requests."""
+    if not forecast_latencies:
+        return jsonify(count=0, loaded_models=model_cache.loaded())
+    samples = np.array(forecast_latencies) * 1000
+    return jsonify(count=len(samples),
+                   p50_ms=round(float(np.percentile(samples, 50)), 2),
+                   p99_ms=round(float(np.percentile(samples, 99)), 2),
+                   loaded_models=model_cache.loaded())
+
+def load_ohlc_range(db_path, table_name, start, end, prefix=''):
+    """Load one row per Datetime (the last written) between start and end, oldest first."""
+    conn = storage.connect(db_path, read_only=True)
+    data = storage.read_range(conn, table_name, start, end)
+    conn.close()
+
+    data['Datetime'] = pd.to_datetime(data['Datetime'], errors='coerce').dt.tz_localize(None)
+    data = data.dropna(subset=['Datetime']).drop_duplicates(subset=['Datetime'], keep='last')
+    return data[['Datetime'] + [f'{prefix}{c}' for c in input_columns]]
+
+def ohlc_series(df, prefix=''):
+    series = {'Datetime': df['Datetime'].dt.strftime(storage.DATETIME_FORMAT).tolist()}
+    for column in input_columns:
+        series[column] = df[f'{prefix}{column}'].tolist()
+    return series
+
+@app.route("/api/ohlc")
+def ohlc():
+    """
+    Actual and predicted OHLCV series for a ticker as JSON.
+    Query parameters: ticker (required), from and to (datetimes, default the
+    full history) and max_points (default 500). Longer ranges are downsampled
+    into OHLC buckets so the payload stays bounded.
+    """
+    table_name = request.args.get('ticker', '')
+    if not re.fullmatch(r'\w+', table_name):
+        return jsonify(error="invalid ticker"), 400
+    try:
+        bounds = []
+        for name, default in (('from', '1900-01-01'), ('to', '2100-01-01')):
+            bound = pd.Timestamp(request.args.get(name, default))
+            if bound is pd.NaT:
+                raise ValueError(f"{name} is not a datetime")
+            # Compare on wall-clock time, as stored bars carry it
+            bounds.append(bound.tz_localize(None) if bound.tz is not None else bound)
+        start, end = bounds
+        max_points = min(max(int(request.args.get('max_points', 500)), 1), 5000)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    conn = storage.connect(nifty50_db_path, read_only=True)
+    actual_exists = table_name in storage.list_tables(conn)
+    conn.close()
+    conn = storage.connect(prediction_db_path, read_only=True)
+    pred_exists = f'{table_name}_predictions' in storage.list_tables(conn)
+    conn.close()
+    if not actual_exists:
+        return jsonify(error=f"unknown ticker {table_name}"), 404
+
+    actual = load_ohlc_range(nifty50_db_path, table_name, start, end)
+    response = {'ticker': table_name, 'bars': len(actual),
+                'actual': ohlc_series(downsample_ohlc(actual, max_points))}
+    if pred_exists:
+        predicted = load_ohlc_range(prediction_db_path, f'{table_name}_predictions', start, end, prefix='Predicted_')
+        response['predicted'] = ohlc_series(downsample_ohlc(predicted, max_points, prefix='Predicted_'), prefix='Predicted_')
+    return jsonify(response)
+
 if __name__ == "__main__":
     app.run(debug=True)
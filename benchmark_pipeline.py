@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import platform
+import tempfile
+from contextlib import contextmanager
+import synthetic_data
+
+INPUT_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+N_STEPS = 12
+N_FUTURE = 3
+
+
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    yield
+    timings[stage] = round(time.perf_counter() - start, 4)
+
+
+def benchmark_size(n_bars, ticker='RELIANCE_NS', duplicate_rate=0.01, nat_rate=0.001, batch_size=256):
+    """
+    Time each pipeline stage on one synthetic ticker with n_bars bars.
+    Runs inside a scratch directory, since the scripts use paths relative to the
+    working directory.
+    Args:
+        n_bars (int): Number of bars in the synthetic ticker table.
+        ticker (str): Table name to generate.
+        duplicate_rate (float): Fraction of duplicated bars.
+        nat_rate (float): Fraction of rows with an unparseable Datetime.
+        batch_size (int): Batch size for Keras and TFLite inference.
+    Returns:
+        dict: Stage name to seconds, plus the sizes involved and the TFLite
+            export's max absolute error against Keras.
+    """
+    import train_rnn
+    import predict_rnn
+    import update_readme
+    import export_tflite
+    import join_predictions
+    from tflite_backend import TFLitePredictor
+
+    timings = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs('models')
+            os.makedirs('predictions')
+            synthetic_data.write_database('nifty50_data_v1.db', tickers=[ticker], n_bars=n_bars,
+                                          duplicate_rate=duplicate_rate, nat_rate=nat_rate)
+
+            with timed(timings, 'preprocess_data'):
+                df = train_rnn.preprocess_data('nifty50_data_v1.db')[ticker]
+
+            df, scaler = train_rnn.scale_data(df, INPUT_COLUMNS)
+            with timed(timings, 'create_sequences'):
+                X, y = train_rnn.create_sequences(df, INPUT_COLUMNS, INPUT_COLUMNS, N_STEPS, N_FUTURE)
+
+            train_rnn.set_random_seed(42)
+            values = train_rnn.to_float32_matrix(df, INPUT_COLUMNS)
+            dataset = train_rnn.make_window_dataset(values, values, N_STEPS, N_FUTURE)
+            with timed(timings, 'train_epoch'):
+                model = train_rnn.train_rnn_model(dataset, verbose=0, epochs=1)
+
+            X_pred = predict_rnn.create_sequences(df, INPUT_COLUMNS, N_STEPS)
+            with timed(timings, 'predict'):
+                predictions = model.predict(X_pred, batch_size=batch_size, verbose=0)
+
+            with open('models/model.tflite', 'wb') as f:
+                f.write(export_tflite.convert_model(model))
+            with timed(timings, 'predict_tflite'):
+                tflite_predictions = TFLitePredictor('models/model.tflite', batch_size=batch_size).predict(X_pred)
+            tflite_error = float(abs(tflite_predictions - predictions).max())
+
+            datetimes = df['Datetime'].dt.tz_localize(None).iloc[N_STEPS:]
+            with timed(timings, 'save_predictions_to_db'):
+                predict_rnn.save_predictions_to_db(predictions, datetimes, 'predictions/predictions.db',
+                                                   f'{ticker}_predictions', scaler)
+
+            with timed(timings, 'join_tables'):
+                join_predictions.join_tables('predictions/predictions.db', 'nifty50_data_v1.db', 'join_pred.db',
+                                             full_rebuild=True)
+
+            with timed(timings, 'update_readme'):
+                update_readme.update_readme()
+        finally:
+            os.chdir(cwd)
+
+    return {'bars': n_bars, 'rows': len(df), 'windows': len(X), 'tflite_max_abs_error': tflite_error, 'stages': timings}
+
+
+def compare_performance_mode(n_bars=20_000, epochs=3, seed=42):
+    """
+    Compare the standard setup with performance mode (see performance.py) on
+    one synthetic ticker: first-epoch time (including tracing or XLA
+    compilation), steady-state epoch time, inference throughput and, for
+    accuracy parity, the validation loss each mode reaches and how far
+    performance-mode inference moves the standard model's own predictions.
+    The performance modes use the current RNN_* settings, with XLA off and on.
+    Args:
+        n_bars (int): Number of bars; the last 20% are used for validation and inference.
+        epochs (int): Epochs timed after the first.
+        seed (int): Seed value for randomness.
+    Returns:
+        dict: Mode name to its timings and losses.
+    """
+    import tensorflow as tf
+    import train_rnn
+    import export_tflite
+    from feature_store import clean_bars
+    from performance import performance_config, scaling_dtype
+
+    bars = clean_bars(synthetic_data.synthetic_bars(n_bars, seed=seed))
+    n_fit = int(len(bars) * 0.8)
+    base = performance_config(True)
+    modes = {'standard': None, 'performance': dict(base, jit_compile=False), 'performance_xla': dict(base, jit_compile=True)}
+    results, standard_model, X_val = {}, None, None
+    for name, config in modes.items():
+        settings = train_rnn.rnn_settings(config)
+        df, _ = train_rnn.scale_data(bars.copy(), INPUT_COLUMNS, scaling_dtype(config))
+        values = train_rnn.to_float32_matrix(df, INPUT_COLUMNS)
+        train_rnn.set_random_seed(seed)
+        fit = train_rnn.make_window_dataset(values[:n_fit], values[:n_fit], N_STEPS, N_FUTURE,
+                                            batch_size=settings['batch_size'], seed=seed)
+        val = train_rnn.make_window_dataset(values[n_fit - N_STEPS:], values[n_fit - N_STEPS:], N_STEPS, N_FUTURE,
+                                            batch_size=settings['batch_size'], shuffle=False)
+        X_val, _ = train_rnn.make_sequences(values[n_fit - N_STEPS:], values[n_fit - N_STEPS:], N_STEPS, N_FUTURE)
+
+        timings = {}
+        with timed(timings, 'first_epoch'):
+            model = train_rnn.train_rnn_model(fit, verbose=0, epochs=1, performance=config)
+        with timed(timings, 'epochs'):
+            model.fit(fit, epochs=epochs, verbose=0)
+
+        # Inference as predict_rnn runs it in each mode, after a warm-up call that traces every batch shape
+        batch_size = 32 if config is None else config['predict_batch_size']
+        model.predict(X_val, batch_size=batch_size, verbose=0)
+        with timed(timings, 'predict'):
+            model.predict(X_val, batch_size=batch_size, verbose=0)
+
+        result = {'batch_size': settings['batch_size'], 'unroll': settings['unroll'],
+                  'jit_compile': settings['jit_compile'], 'first_epoch_seconds': timings['first_epoch'],
+                  'epoch_seconds': round(timings['epochs'] / epochs, 4),
+                  'predict_windows_per_second': round(len(X_val) / timings['predict']),
+                  'val_loss': float(model.evaluate(val, verbose=0))}
+        if config is None:
+            standard_model = model
+        else:
+            # Same weights through this mode's inference path, to isolate numeric drift from training drift
+            same_weights = export_tflite.unrolled_copy(standard_model) if config['unroll'] else standard_model
+            same_weights.compile(jit_compile=config['jit_compile'])
+            drift = same_weights.predict(X_val, batch_size=batch_size, verbose=0) - standard_model.predict(
+                X_val, batch_size=1024, verbose=0)
+            result['standard_weights_max_abs_diff'] = float(abs(drift).max())
+        results[name] = result
+        tf.keras.backend.clear_session()
+    return results
+
+
+def main(sizes, output_path):
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'runs': [],
+    }
+    for n_bars in sizes:
+        run = benchmark_size(n_bars)
+        results['runs'].append(run)
+        print(f"{n_bars} bars: " + ', '.join(f"{k}={v}s" for k, v in run['stages'].items()))
+
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time each pipeline stage on synthetic data.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2_000, 10_000, 50_000],
+                        help="Bars per ticker for each run.")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare-performance', action='store_true',
+                        help="Instead, compare standard and performance-mode training and inference.")
+    args = parser.parse_args()
+    if args.compare_performance:
+        comparison = compare_performance_mode()
+        for mode, result in comparison.items():
+            print(f"{mode}: " + ', '.join(f"{k}={v}" for k, v in result.items()))
+        with open(args.output, 'w') as f:
+            json.dump(comparison, f, indent=2)
+    else:
+        main(args.sizes, os.path.abspath(args.output))
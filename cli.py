@@ -0,0 +1,143 @@
+# Command-line entry point for the pipeline scripts, e.g.
+#     python -m cli train --tickers RELIANCE_NS TCS_NS --n-steps 12
+#     python -m cli predict --backend tflite
+# Only argparse is imported up front; each subcommand imports the script it
+# runs, so join, accuracy and readme never load TensorFlow.
+import argparse
+import sys
+
+DATABASE = 'nifty50_data_v1.db'
+PREDICTIONS_DB = 'predictions/predictions.db'
+JOIN_DB = 'join_pred.db'
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
+def run_train(args):
+    import train_rnn
+    train_rnn.main(workers=args.workers, threads_per_worker=args.threads_per_worker, full_retrain=args.full_retrain,
+                   finetune_epochs=args.finetune_epochs, store_dir=args.feature_store, multi_ticker=args.multi_ticker,
+                   max_epochs=args.max_epochs, patience=args.patience, performance=args.performance,
+                   database_path=args.database, tickers=args.tickers, n_steps=args.n_steps, n_future=args.n_future)
+
+
+def run_predict(args):
+    import predict_rnn
+    if args.compare_models:
+        predict_rnn.compare_models(database_path=args.database)
+        return
+    predict_rnn.main(full_rebuild=args.full_rebuild, backend=args.backend, store_dir=args.feature_store,
+                     multi_ticker=args.multi_ticker, performance=args.performance, database_path=args.database,
+                     predictions_db_path=args.predictions_db, tickers=args.tickers, n_steps=args.n_steps,
+                     scenarios=args.scenarios)
+
+
+def run_join(args):
+    import join_predictions
+    join_predictions.join_tables(args.predictions_db, args.database, args.join_db,
+                                 full_rebuild=args.full_rebuild, tickers=args.tickers)
+
+
+def run_accuracy(args):
+    import accuracy
+    for table, rows in accuracy.update_accuracy(args.join_db, full_rebuild=args.full_rebuild).items():
+        print(f"{table}: {rows} new rows scored")
+
+
+def run_readme(args):
+    import update_readme
+    update_readme.update_readme(db_path=args.predictions_db, readme_path=args.readme, accuracy_db_path=args.join_db)
+
+
+def run_charts(args):
+    import generate_charts
+    results = generate_charts.generate_charts(nifty50_db_path=args.database, prediction_db_path=args.predictions_db,
+                                              output_dir=args.output_dir, max_points=args.max_points,
+                                              tickers=args.tickers, force=args.force)
+    for table, status in results.items():
+        print(f"{table}: {status}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m cli', description="Train, predict, join and report on the RNN models.")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+
+    def add_command(name, handler, help):
+        command = subparsers.add_parser(name, help=help, description=help)
+        command.set_defaults(handler=handler)
+        return command
+
+    def add_tickers(command):
+        command.add_argument('--tickers', nargs='+', metavar='TABLE', default=None,
+                             help="Only these ticker tables (default: all).")
+
+    train = add_command('train', run_train, "Train or fine-tune one RNN model per ticker table.")
+    train.add_argument('--database', default=DATABASE)
+    add_tickers(train)
+    train.add_argument('--n-steps', type=int, default=12, help="Bars per input window.")
+    train.add_argument('--n-future', type=int, default=3, help="Bars predicted per window.")
+    train.add_argument('--workers', type=int, default=1, help="Number of tickers to train in parallel worker processes.")
+    train.add_argument('--threads-per-worker', type=int, default=None,
+                       help="TensorFlow thread budget per worker (default: CPUs divided by workers).")
+    train.add_argument('--full-retrain', action='store_true', help="Retrain every ticker from scratch.")
+    train.add_argument('--finetune-epochs', type=int, default=3, help="Epochs when fine-tuning on new bars.")
+    train.add_argument('--max-epochs', type=int, default=50, help="Upper bound on epochs for a full retrain.")
+    train.add_argument('--patience', type=int, default=5, help="Epochs without validation improvement before stopping.")
+    train.add_argument('--feature-store', metavar='DIR', default=None, help="Read cleaned bars from a feature store in DIR.")
+    train.add_argument('--multi-ticker', action='store_true', help="Train one shared model with a ticker embedding.")
+    train.add_argument('--performance', action='store_true', default=None, help="Use performance mode (see performance.py).")
+
+    predict = add_command('predict', run_predict, "Predict future bars for every ticker table.")
+    predict.add_argument('--database', default=DATABASE)
+    predict.add_argument('--predictions-db', default=PREDICTIONS_DB)
+    add_tickers(predict)
+    predict.add_argument('--n-steps', type=int, default=12, help="Bars per input window the models were trained with.")
+    predict.add_argument('--full-rebuild', action='store_true', help="Recompute and replace all predictions.")
+    predict.add_argument('--backend', choices=['keras', 'tflite'], default='keras')
+    predict.add_argument('--feature-store', metavar='DIR', default=None, help="Read cleaned bars from a feature store in DIR.")
+    predict.add_argument('--multi-ticker', action='store_true', help="Forecast with the shared multi-ticker model.")
+    predict.add_argument('--compare-models', action='store_true',
+                         help="Instead of predicting, report shared vs per-ticker model errors on recent bars.")
+    predict.add_argument('--performance', action='store_true', default=None, help="Use performance mode (see performance.py).")
+    predict.add_argument('--scenarios', type=positive_int, default=0, metavar='K',
+                         help="Write mean and p10/p50/p90 bands of K Monte Carlo dropout samples per window instead.")
+
+    join = add_command('join', run_join, "Join actual bars with their predictions into join_pred.db.")
+    join.add_argument('--database', default=DATABASE)
+    join.add_argument('--predictions-db', default=PREDICTIONS_DB)
+    join.add_argument('--join-db', default=JOIN_DB)
+    add_tickers(join)
+    join.add_argument('--full-rebuild', action='store_true', help="Rebuild every joined table from scratch.")
+
+    accuracy = add_command('accuracy', run_accuracy, "Update rolling prediction accuracy metrics from the joined tables.")
+    accuracy.add_argument('--join-db', default=JOIN_DB)
+    accuracy.add_argument('--full-rebuild', action='store_true', help="Recompute every ticker from all joined rows.")
+
+    readme = add_command('readme', run_readme, "Write the latest predictions and accuracy to the README.")
+    readme.add_argument('--predictions-db', default=PREDICTIONS_DB)
+    readme.add_argument('--join-db', default=JOIN_DB)
+    readme.add_argument('--readme', default='README.md')
+
+    charts = add_command('charts', run_charts, "Write one candlestick page per ticker, rebuilding only changed tickers.")
+    charts.add_argument('--database', default=DATABASE)
+    charts.add_argument('--predictions-db', default=PREDICTIONS_DB)
+    add_tickers(charts)
+    charts.add_argument('--output-dir', default='charts')
+    charts.add_argument('--max-points', type=int, default=2000, help="Maximum candlesticks per trace.")
+    charts.add_argument('--force', action='store_true', help="Rebuild every page.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
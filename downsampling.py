@@ -0,0 +1,24 @@
+import numpy as np
+
+
+def downsample_ohlc(df, max_points, prefix=''):
+    """
+    Reduce an OHLC(V) series to at most max_points bars by merging consecutive
+    bars into equal-sized buckets. Each bucket keeps the first Open, the highest
+    High, the lowest Low, the last Close and the summed Volume, so candlesticks
+    still span the true price range.
+    Args:
+        df (pd.DataFrame): Bars sorted by Datetime.
+        max_points (int): Maximum number of bars to return.
+        prefix (str): Column name prefix, e.g. 'Predicted_' for prediction tables.
+    Returns:
+        pd.DataFrame: Bars stamped with the Datetime of each bucket's first bar.
+    """
+    if len(df) <= max_points:
+        return df.reset_index(drop=True)
+    bucket = np.arange(len(df)) * max_points // len(df)
+    aggregations = {'Datetime': 'first', f'{prefix}Open': 'first', f'{prefix}High': 'max',
+                    f'{prefix}Low': 'min', f'{prefix}Close': 'last'}
+    if f'{prefix}Volume' in df.columns:
+        aggregations[f'{prefix}Volume'] = 'sum'
+    return df.groupby(bucket, sort=False).agg(aggregations).reset_index(drop=True)
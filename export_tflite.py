@@ -0,0 +1,154 @@
+import os
+import json
+import glob
+import tempfile
+import numpy as np
+import joblib
+import tensorflow as tf
+import storage
+from tflite_backend import tflite_path_for, TFLitePredictor
+from predict_rnn import preprocess_new_data, create_sequences
+
+QUANTIZATION_MODES = ('none', 'dynamic', 'float16')
+
+
+def unrolled_copy(model):
+    """
+    Rebuild a model with its LSTM/GRU layers unrolled and the same weights.
+    With a dynamic batch dimension the converter cannot lower the recurrent
+    while-loops to builtin TFLite ops; unrolled over the 12-step window they
+    become plain matmuls that any TFLite interpreter can run.
+    """
+    def clone_layer(layer):
+        config = layer.get_config()
+        if 'unroll' in config:
+            config['unroll'] = True
+        return layer.__class__.from_config(config)
+
+    unrolled = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    unrolled.set_weights(model.get_weights())
+    return unrolled
+
+
+def convert_model(model, quantization='none'):
+    """
+    Convert a Keras model to a TFLite flatbuffer.
+    Args:
+        model (Model): Trained Keras model.
+        quantization (str): 'none', 'dynamic' (int8 weights) or 'float16'.
+    Returns:
+        bytes: The TFLite model.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATION_MODES}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(unrolled_copy(model))
+    if quantization != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def parity_windows(database_path, table_name, scaler, n_steps=12, n_windows=512):
+    """
+    Build scaled input windows from the most recent bars of a ticker, falling
+    back to uniform samples of the scaled feature range if the table is missing.
+    """
+    n_features = scaler.n_features_in_
+    if os.path.exists(database_path):
+        conn = storage.connect(database_path, read_only=True)
+        try:
+            if table_name in storage.list_tables(conn):
+                df = storage.read_latest(conn, table_name, n_windows + n_steps, one_per_datetime=True)
+                df = preprocess_new_data(df)
+                columns = list(getattr(scaler, 'feature_names_in_', ['Open', 'High', 'Low', 'Close', 'Volume']))
+                if len(df) > n_steps:
+                    df[columns] = scaler.transform(df[columns])
+                    return np.array(create_sequences(df, columns, n_steps))
+        finally:
+            conn.close()
+    rng = np.random.default_rng(42)
+    return rng.uniform(0, 1, (n_windows, n_steps, n_features)).astype(np.float32)
+
+
+def max_abs_error(model, tflite_path, X):
+    """
+    Largest absolute difference between Keras and TFLite predictions, in the
+    scaled space the model works in.
+    """
+    expected = model.predict(X, verbose=0)
+    actual = TFLitePredictor(tflite_path).predict(X)
+    return float(np.abs(expected - actual).max())
+
+
+def export_ticker(model_path, scaler_path, quantization='none', database_path='nifty50_data_v1.db'):
+    """
+    Export one ticker's model next to its .h5 file and check it against Keras.
+    Returns:
+        dict: Export summary with the TFLite path, size and max absolute error.
+    """
+    table_name = os.path.basename(model_path)[:-len('_model.h5')]
+    tflite_path = tflite_path_for(model_path)
+    model = tf.keras.models.load_model(model_path, compile=False)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(tflite_path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(convert_model(model, quantization))
+        X = parity_windows(database_path, table_name, joblib.load(scaler_path),
+                           n_steps=model.inputs[0].shape[1])
+        error = max_abs_error(model, tmp_path, X)
+        os.replace(tmp_path, tflite_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {'table': table_name, 'tflite_path': tflite_path, 'quantization': quantization,
+            'bytes': os.path.getsize(tflite_path), 'parity_windows': len(X), 'max_abs_error': error}
+
+
+def main(models_dir='models', quantization='none', database_path='nifty50_data_v1.db', max_error=None):
+    """
+    Export every <ticker>_model.h5 in models_dir to <ticker>_model.tflite and
+    write the parity report to tflite_parity.json. The shared multi-ticker
+    model is not exported; predict_rnn.py always runs it with Keras.
+    Args:
+        models_dir (str): Directory holding the models and scalers.
+        quantization (str): 'none', 'dynamic' or 'float16'.
+        database_path (str): Source bars used for the parity check.
+        max_error (float): Fail if any model's max absolute error exceeds this.
+    """
+    results = []
+    for model_path in sorted(glob.glob(os.path.join(models_dir, '*_model.h5'))):
+        if os.path.basename(model_path) == 'multi_ticker_model.h5':
+            print(f"{model_path} is the shared multi-ticker model, which runs with Keras only. Skipping...")
+            continue
+        scaler_path = model_path[:-len('_model.h5')] + '_scaler.pkl'
+        if not os.path.exists(scaler_path):
+            print(f"Scaler for {model_path} not found. Skipping...")
+            continue
+        result = export_ticker(model_path, scaler_path, quantization, database_path)
+        results.append(result)
+        print(f"{result['table']}: {result['bytes'] / 1024:.0f} KiB ({quantization}), "
+              f"max abs error {result['max_abs_error']:.2e} over {result['parity_windows']} windows")
+
+    with open(os.path.join(models_dir, 'tflite_parity.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+
+    failed = [r['table'] for r in results if max_error is not None and r['max_abs_error'] > max_error]
+    if failed:
+        raise RuntimeError(f"TFLite parity check failed for: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export Keras models to TFLite and check parity against Keras.")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--quantization', choices=QUANTIZATION_MODES, default='none',
+                        help="'dynamic' stores int8 weights, 'float16' half-precision weights.")
+    parser.add_argument('--database', default='nifty50_data_v1.db', help="Bars used to build parity-check windows.")
+    parser.add_argument('--max-error', type=float, default=None,
+                        help="Fail if any model's max absolute error (scaled units) exceeds this.")
+    args = parser.parse_args()
+    main(models_dir=args.models_dir, quantization=args.quantization,
+         database_path=args.database, max_error=args.max_error)
@@ -0,0 +1,231 @@
+import os
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+import storage
+from windowing import scale_rows, sliding_windows
+
+FEATURE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+STORE_DIR = 'feature_store'
+MANIFEST = 'manifest.json'
+
+
+def clean_bars(df):
+    """
+    Apply the cleaning every consumer used to repeat: parse Datetime, keep the
+    local wall time, drop unparseable rows, keep the first row written for each
+    Datetime and sort.
+    Args:
+        df (pd.DataFrame): Raw rows in write order.
+    Returns:
+        pd.DataFrame: Cleaned rows.
+    """
+    df = df.copy()
+    df['Datetime'] = pd.to_datetime(df['Datetime'], errors='coerce')
+    if df['Datetime'].dt.tz is not None:
+        df['Datetime'] = df['Datetime'].dt.tz_localize(None)
+    df = df.dropna(subset=['Datetime']).drop_duplicates(subset=['Datetime'])
+    return df.sort_values('Datetime', kind='stable')
+
+
+def row_signature(conn, table, rowid):
+    """Text fingerprint of the source row at a rowid, to notice a replaced table."""
+    return repr(conn.execute(f'SELECT * FROM "{table}" WHERE rowid=?;', (rowid,)).fetchone())
+
+
+class FeatureStore:
+    """
+    Cache of each ticker's cleaned bars as flat binary files that can be
+    memory-mapped: <store_dir>/<ticker>/datetime.bin (int64 nanoseconds) and
+    values.bin (float32, one row of FEATURE_COLUMNS per bar). manifest.json
+    records, per ticker, the number of cached bars, the last cached Datetime
+    and the source rowid (with a fingerprint of that row) consumed so far.
+
+    sync() reads only source rows written after that rowid and appends the new
+    bars to the files; a ticker is rebuilt when its source table was replaced
+    or a new bar lands before the last cached one.
+
+    Args:
+        store_dir (str): Directory holding the cache.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.manifest_path = os.path.join(store_dir, MANIFEST)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def _paths(self, ticker):
+        ticker_dir = os.path.join(self.store_dir, ticker)
+        return os.path.join(ticker_dir, 'datetime.bin'), os.path.join(ticker_dir, 'values.bin')
+
+    def _entry(self, ticker):
+        """Manifest entry for a ticker, or None if its files are missing or short."""
+        entry = self.manifest.get(ticker)
+        if entry is None:
+            return None
+        datetime_path, values_path = self._paths(ticker)
+        rows = entry['rows']
+        if not (os.path.exists(datetime_path) and os.path.getsize(datetime_path) >= rows * 8
+                and os.path.exists(values_path) and os.path.getsize(values_path) >= rows * 4 * len(FEATURE_COLUMNS)):
+            return None
+        return entry
+
+    def _save_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _read_source(self, conn, table, after_rowid=0):
+        columns = ', '.join(f'"{c}"' for c in FEATURE_COLUMNS)
+        raw = pd.read_sql(
+            f'SELECT rowid AS source_rowid, Datetime, {columns} FROM "{table}" WHERE rowid > ? ORDER BY rowid;',
+            conn, params=(after_rowid,),
+        )
+        return raw, clean_bars(raw)
+
+    def _write(self, ticker, bars, append):
+        datetime_path, values_path = self._paths(ticker)
+        os.makedirs(os.path.dirname(datetime_path), exist_ok=True)
+        datetimes = bars['Datetime'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        values = bars[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        if append:
+            rows = self.manifest[ticker]['rows']
+            # Drop anything a crashed append left past the manifest before adding to it
+            for path, array, width in ((datetime_path, datetimes, 8), (values_path, values, 4 * len(FEATURE_COLUMNS))):
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * width)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(array).tobytes())
+        else:
+            for path, array in ((datetime_path, datetimes), (values_path, values)):
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(np.ascontiguousarray(array).tobytes())
+                os.replace(tmp_path, path)
+
+    def sync_table(self, conn, table):
+        """
+        Bring one ticker's cache up to date with its source table.
+        Args:
+            conn (sqlite3.Connection): Connection to the source database.
+            table (str): Ticker table name.
+        Returns:
+            tuple: Mode ('rebuild', 'append' or 'unchanged') and the number of bars written.
+        """
+        source_rowid = conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{table}";').fetchone()[0]
+        entry = self._entry(table)
+        # A source table was replaced if the row at the consumed rowid is gone or different
+        if entry is not None and (entry['rows'] == 0
+                                  or row_signature(conn, table, entry['source_rowid']) != entry['source_signature']):
+            entry = None
+        if entry is not None and entry['source_rowid'] == source_rowid:
+            return 'unchanged', 0
+
+        raw, bars = self._read_source(conn, table, 0 if entry is None else entry['source_rowid'])
+        if entry is not None and len(bars):
+            cached = self.datetimes(table)
+            new = bars['Datetime'].to_numpy(dtype='datetime64[ns]')
+            # The first row written for a Datetime wins, so repeats of cached bars are dropped
+            positions = np.minimum(np.searchsorted(cached, new), len(cached) - 1)
+            bars = bars[cached[positions] != new]
+            if len(bars) and bars['Datetime'].iloc[0] <= pd.Timestamp(entry['last_datetime']):
+                entry = None
+                raw, bars = self._read_source(conn, table)
+
+        mode = 'rebuild' if entry is None else 'append'
+        self._write(table, bars, append=entry is not None)
+        rows = len(bars) + (0 if entry is None else entry['rows'])
+        last_datetime = bars['Datetime'].iloc[-1] if len(bars) else (entry or {}).get('last_datetime')
+        self.manifest[table] = {
+            'rows': rows,
+            'last_datetime': None if last_datetime is None else pd.Timestamp(last_datetime).isoformat(),
+            'source_rows': len(raw) + (0 if entry is None else entry['source_rows']),
+            'source_rowid': source_rowid,
+            'source_signature': row_signature(conn, table, source_rowid),
+            'columns': FEATURE_COLUMNS,
+        }
+        return mode, len(bars)
+
+    def sync(self, database_path, tables=None):
+        """
+        Bring the cache up to date with every ticker table in a database.
+        Args:
+            database_path (str): Source database, e.g. nifty50_data_v1.db.
+            tables (list): Tables to sync. Defaults to every ticker table.
+        Returns:
+            dict: Table name to (mode, bars written).
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        conn = storage.connect(database_path, read_only=True)
+        try:
+            tables = storage.list_tables(conn) if tables is None else tables
+            results = {table: self.sync_table(conn, table) for table in tables}
+        finally:
+            conn.close()
+        self._save_manifest()
+        return results
+
+    def tickers(self):
+        return sorted(self.manifest)
+
+    def __len__(self):
+        return len(self.manifest)
+
+    def rows(self, ticker):
+        return self.manifest[ticker]['rows']
+
+    def datetimes(self, ticker):
+        """Cached bar Datetimes as a read-only datetime64[ns] memory map."""
+        rows = self.rows(ticker)
+        if rows == 0:
+            return np.empty(0, dtype='datetime64[ns]')
+        return np.memmap(self._paths(ticker)[0], dtype=np.int64, mode='r', shape=(rows,)).view('datetime64[ns]')
+
+    def values(self, ticker):
+        """Cached FEATURE_COLUMNS as a read-only float32 memory map of shape (rows, F)."""
+        rows = self.rows(ticker)
+        if rows == 0:
+            return np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32)
+        return np.memmap(self._paths(ticker)[1], dtype=np.float32, mode='r', shape=(rows, len(FEATURE_COLUMNS)))
+
+    def windows(self, ticker, n_steps, start=0, count=None, scaler=None, dtype=np.float64):
+        """
+        Input windows read straight from the memory map. Without a scaler
+        nothing is copied; with one, only the rows the windows cover are read
+        and scaled (see windowing.scale_rows).
+        Args:
+            ticker (str): Ticker table name.
+            n_steps (int): Bars per window.
+            start (int): Position of the first window's first bar.
+            count (int): Number of windows. Defaults to every full window from start.
+            scaler (MinMaxScaler): Scaler to apply, or None for raw values.
+            dtype (type): Dtype the rows are scaled in.
+        Returns:
+            np.ndarray: Read-only float32 view of shape (count, n_steps, F).
+        """
+        stop = None if count is None else start + count + n_steps - 1
+        values = self.values(ticker)[start:stop]
+        if scaler is not None:
+            values = scale_rows(values, scaler, dtype)
+        return sliding_windows(values, n_steps, count=count)
+
+    def position_after(self, ticker, timestamp):
+        """Number of cached bars at or before timestamp."""
+        return int(np.searchsorted(self.datetimes(ticker), np.datetime64(pd.Timestamp(timestamp), 'ns'), side='right'))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or update the memory-mapped feature store.")
+    parser.add_argument('--database', default='nifty50_data_v1.db')
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+    store = FeatureStore(args.store_dir)
+    for table, (mode, written) in store.sync(args.database).items():
+        print(f"{table}: {mode}, {written} bars written, {store.rows(table)} cached")
@@ -1,61 +1,183 @@
-import sqlite3
+import os
+import json
+import tempfile
 import pandas as pd
-import plotly.graph_objects as go
+import storage
+from downsampling import downsample_ohlc
+from feature_store import clean_bars, row_signature
+from instrumentation import MetricsRecorder
+
+metrics = MetricsRecorder('generate_charts')
 
 # Paths to databases
 nifty50_db_path = 'nifty50_data_v1.db'
 prediction_db_path = 'predictions/predictions.db'
 
-# Output directory
-output_html_path = 'charts/candlestick_charts.html'
-
-# Function to load and process data from a database
-def load_and_process_data(db_path, table_name):
-    with sqlite3.connect(db_path) as conn:
-        # Load data from the table
-        data = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-
-    # Drop duplicate rows based on the Datetime column, keeping the last occurrence
-    data = data.drop_duplicates(subset=['Datetime'], keep='last')
-
-    # Sort data by Datetime to maintain order
-    data['Datetime'] = pd.to_datetime(data['Datetime'])  # Ensure Datetime is in datetime format
-    data = data.sort_values(by='Datetime')
-
-    # Select the last 120 rows
-    return data.tail(120)
-
-# Load and process data from nifty50_data_v1.db
-nifty50_data = load_and_process_data(nifty50_db_path, 'nifty50_table')
-
-# Load and process data from predictions.db
-prediction_data = load_and_process_data(prediction_db_path, 'prediction_table')
-
-# Generate candlestick chart for nifty50_data
-fig1 = go.Figure(data=[go.Candlestick(
-    x=nifty50_data['Datetime'],
-    open=nifty50_data['Open'],
-    high=nifty50_data['High'],
-    low=nifty50_data['Low'],
-    close=nifty50_data['Close']
-)])
-fig1.update_layout(title='Nifty50 Data Candlestick Chart', xaxis_title='Datetime', yaxis_title='Price')
-
-# Generate candlestick chart for predictions
-fig2 = go.Figure(data=[go.Candlestick(
-    x=prediction_data['Datetime'],
-    open=prediction_data['Open'],
-    high=prediction_data['High'],
-    low=prediction_data['Low'],
-    close=prediction_data['Close']
-)])
-fig2.update_layout(title='Prediction Data Candlestick Chart', xaxis_title='Datetime', yaxis_title='Price')
-
-# Save the charts as HTML
-with open(output_html_path, 'w') as f:
-    f.write('<h1>Nifty50 Data Candlestick Chart</h1>')
-    f.write(fig1.to_html(full_html=False, include_plotlyjs='cdn'))
-    f.write('<h1>Prediction Data Candlestick Chart</h1>')
-    f.write(fig2.to_html(full_html=False, include_plotlyjs='cdn'))
-
-print(f"HTML file with candlestick charts has been updated: {output_html_path}")
+# Output directory: one page per ticker, index.html, the shared Plotly bundle and the manifest
+output_dir = 'charts'
+PLOTLY_BUNDLE = 'plotly.min.js'
+MANIFEST = 'manifest.json'
+MAX_POINTS = 2000
+
+
+def source_mark(conn, table):
+    """
+    High-water mark of a source table: its largest rowid and a fingerprint of
+    that row. New bars, new predictions and replaced tables all change it.
+    """
+    rowid = conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{table}";').fetchone()[0]
+    return [rowid, row_signature(conn, table, rowid)]
+
+
+def load_predicted(conn, pred_table):
+    """Predicted bars of a ticker, keeping the last forecast written for each Datetime."""
+    data = pd.read_sql(f'SELECT * FROM "{pred_table}" ORDER BY Datetime, rowid;', conn)
+    data['Datetime'] = pd.to_datetime(data['Datetime'], errors='coerce')
+    return data.dropna(subset=['Datetime']).drop_duplicates(subset=['Datetime'], keep='last')
+
+
+def write_text(path, text):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    # mkstemp creates owner-only files; the pages are meant to be served
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def render_page(table_name, actual, predicted, path, max_points=MAX_POINTS):
+    """
+    Write one ticker's page with actual and predicted candlesticks overlaid,
+    each downsampled to at most max_points bars. The page loads the shared
+    Plotly bundle next to it instead of embedding its own copy.
+    """
+    import plotly.graph_objects as go
+
+    actual = downsample_ohlc(actual, max_points)
+    fig = go.Figure(data=[go.Candlestick(
+        x=actual['Datetime'], open=actual['Open'], high=actual['High'], low=actual['Low'], close=actual['Close'],
+        name='Actual', increasing_line_color='green', decreasing_line_color='red',
+    )])
+    if predicted is not None and len(predicted):
+        predicted = downsample_ohlc(predicted, max_points, prefix='Predicted_')
+        fig.add_trace(go.Candlestick(
+            x=predicted['Datetime'], open=predicted['Predicted_Open'], high=predicted['Predicted_High'],
+            low=predicted['Predicted_Low'], close=predicted['Predicted_Close'],
+            name='Predicted', increasing_line_color='blue', decreasing_line_color='orange',
+        ))
+    fig.update_layout(
+        title=f'{table_name}: actual vs predicted', xaxis_title='Datetime', yaxis_title='Price',
+        xaxis_rangeslider_visible=False,
+        # Hide nights and weekends so consecutive session bars sit next to each other
+        xaxis=dict(rangebreaks=[dict(bounds=['sat', 'mon']), dict(bounds=[15.5, 9.25], pattern='hour')]),
+    )
+    write_text(path, fig.to_html(full_html=True, include_plotlyjs=PLOTLY_BUNDLE))
+
+
+def write_index(output_dir, manifest):
+    links = '\n'.join(
+        f'<li><a href="{entry["page"]}">{table_name}</a> ({entry["bars"]} bars, {entry["predicted_bars"]} predicted)</li>'
+        for table_name, entry in sorted(manifest['tickers'].items())
+    )
+    write_text(os.path.join(output_dir, 'index.html'),
+               '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Candlestick charts</title></head>\n'
+               f'<body><h1>Candlestick charts</h1>\n<ul>\n{links}\n</ul></body></html>\n')
+
+
+def generate_charts(nifty50_db_path=nifty50_db_path, prediction_db_path=prediction_db_path, output_dir=output_dir,
+                    max_points=MAX_POINTS, tickers=None, force=False):
+    """
+    Write <output_dir>/<ticker>.html for every ticker table and an index.html
+    linking them. manifest.json records the rowid high-water marks of each
+    ticker's bars and predictions a page was built from; a page is only
+    rebuilt when one of them moved, or when max_points or the Plotly version
+    changed.
+    Args:
+        nifty50_db_path (str): Database of actual bars.
+        prediction_db_path (str): Database of <ticker>_predictions tables.
+        output_dir (str): Directory the pages are written to.
+        max_points (int): Maximum candlesticks per trace.
+        tickers (list): Only consider these ticker tables. Defaults to every table.
+        force (bool): Rebuild every page.
+    Returns:
+        dict: Ticker table name to 'built' or 'unchanged'.
+    """
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    manifest.setdefault('tickers', {})
+    bundle_path = os.path.join(output_dir, PLOTLY_BUNDLE)
+    if manifest.get('plotly_version') != plotly.__version__ or not os.path.exists(bundle_path):
+        with metrics.stage('bundle'):
+            write_text(bundle_path, get_plotlyjs())
+        manifest['plotly_version'] = plotly.__version__
+    # A page is also stale when it was drawn with another bucket size or Plotly version
+    settings = [max_points, plotly.__version__]
+
+    conn = storage.connect(nifty50_db_path, read_only=True)
+    pred_conn = storage.connect(prediction_db_path, read_only=True) if os.path.exists(prediction_db_path) else None
+    results = {}
+    try:
+        tables = storage.list_tables(conn)
+        if tickers is not None:
+            tables = [table for table in tables if table in tickers]
+        pred_tables = set(storage.list_tables(pred_conn, suffix='_predictions')) if pred_conn is not None else set()
+        for table_name in tables:
+            pred_table = f'{table_name}_predictions'
+            marks = {'actual': source_mark(conn, table_name),
+                     'predicted': source_mark(pred_conn, pred_table) if pred_table in pred_tables else None}
+            entry = manifest['tickers'].get(table_name)
+            page = f'{table_name}.html'
+            if (not force and entry is not None and entry['marks'] == marks and entry['settings'] == settings
+                    and os.path.exists(os.path.join(output_dir, page))):
+                results[table_name] = 'unchanged'
+                continue
+
+            with metrics.stage('load', ticker=table_name) as m:
+                actual = clean_bars(pd.read_sql(f'SELECT * FROM "{table_name}";', conn))
+                predicted = load_predicted(pred_conn, pred_table) if marks['predicted'] is not None else None
+                m['rows'] = len(actual) + (0 if predicted is None else len(predicted))
+            with metrics.stage('render', ticker=table_name, rows=m['rows']):
+                render_page(table_name, actual, predicted, os.path.join(output_dir, page), max_points)
+            manifest['tickers'][table_name] = {
+                'page': page, 'marks': marks, 'settings': settings, 'bars': len(actual),
+                'predicted_bars': 0 if predicted is None else len(predicted),
+            }
+            results[table_name] = 'built'
+    finally:
+        conn.close()
+        if pred_conn is not None:
+            pred_conn.close()
+
+    # Drop the pages of tickers that no longer exist, unless only some tickers were considered
+    if tickers is None:
+        for table_name in set(manifest['tickers']) - set(tables):
+            page_path = os.path.join(output_dir, manifest['tickers'].pop(table_name)['page'])
+            if os.path.exists(page_path):
+                os.remove(page_path)
+    write_index(output_dir, manifest)
+    write_text(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    metrics.flush()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write one candlestick page per ticker, rebuilding only changed tickers.")
+    parser.add_argument('--database', default=nifty50_db_path)
+    parser.add_argument('--predictions-db', default=prediction_db_path)
+    parser.add_argument('--output-dir', default=output_dir)
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS, help="Maximum candlesticks per trace.")
+    parser.add_argument('--force', action='store_true', help="Rebuild every page.")
+    args = parser.parse_args()
+    results = generate_charts(args.database, args.predictions_db, args.output_dir, args.max_points, force=args.force)
+    for table_name, status in results.items():
+        print(f"{table_name}: {status}")
+    print(f"Charts written to {os.path.join(args.output_dir, 'index.html')}")
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import uuid
+import functools
+from contextlib import contextmanager
+import storage
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_TABLE = 'pipeline_metrics'
+
+
+COLUMNS = {
+    'run_id': 'TEXT', 'script': 'TEXT', 'stage': 'TEXT', 'ticker': 'TEXT', 'started_at': 'TEXT',
+    'wall_seconds': 'REAL', 'cpu_seconds': 'REAL', 'rss_start_mb': 'REAL', 'rss_end_mb': 'REAL',
+    'peak_rss_mb': 'REAL', 'rows': 'INTEGER',
+}
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None where
+    unavailable). This is a lifetime high-water mark, so it only changes in
+    the stage that sets a new peak.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def rss_mb():
+    """Current resident set size of this process in MB, from /proc (None where unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+
+class MetricsRecorder:
+    """
+    Collects per-stage wall time, CPU time, memory and row counts for one
+    pipeline script and writes them to the pipeline_metrics table and,
+    optionally, a JSON-lines file. Memory is the resident set size when the
+    stage starts and ends (their difference is what the stage kept
+    allocated) and the process's peak RSS so far when it ends.
+
+    Args:
+        script (str): Name of the script the stages belong to.
+        db_path (str): Metrics database. Defaults to $PIPELINE_METRICS_DB or pipeline_metrics.db.
+        jsonl_path (str): Optional JSON-lines file. Defaults to $PIPELINE_METRICS_JSONL.
+    """
+
+    def __init__(self, script, db_path=None, jsonl_path=None):
+        self.script = script
+        self.db_path = db_path or os.environ.get('PIPELINE_METRICS_DB', 'pipeline_metrics.db')
+        self.jsonl_path = jsonl_path or os.environ.get('PIPELINE_METRICS_JSONL')
+        # Scripts started by the same pipeline run share PIPELINE_RUN_ID
+        self.run_id = os.environ.get('PIPELINE_RUN_ID') or uuid.uuid4().hex[:12]
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, ticker=None, rows=None):
+        """
+        Time a block. The yielded dict can be updated with 'rows' once the
+        row count is known.
+
+            with metrics.stage('read', ticker=table_name) as m:
+                df = pd.read_sql(...)
+                m['rows'] = len(df)
+        """
+        record = {'rows': rows}
+        started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        rss_start = rss_mb()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            self.records.append({
+                'run_id': self.run_id,
+                'script': self.script,
+                'stage': name,
+                'ticker': ticker,
+                'started_at': started_at,
+                'wall_seconds': round(time.perf_counter() - wall_start, 6),
+                'cpu_seconds': round(time.process_time() - cpu_start, 6),
+                'rss_start_mb': rss_start,
+                'rss_end_mb': rss_mb(),
+                'peak_rss_mb': peak_rss_mb(),
+                'rows': record.get('rows'),
+            })
+
+    def timed(self, name, rows=None):
+        """
+        Decorator form of stage().
+        Args:
+            name (str): Stage name.
+            rows (callable): Optional function mapping the return value to a row count.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name) as record:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        record['rows'] = rows(result)
+                    return result
+            return wrapper
+        return decorator
+
+    def flush(self):
+        """Write the collected records in one transaction and clear them."""
+        if not self.records:
+            return
+        columns = list(self.records[0])
+        conn = storage.connect(self.db_path)
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {METRICS_TABLE} ({', '.join(f'{c} {t}' for c, t in COLUMNS.items())});"
+            )
+            # Tables created before a column was added get it with NULLs for the old rows
+            existing = {name for (_, name, *_) in conn.execute(f"PRAGMA table_info({METRICS_TABLE});")}
+            for column, column_type in COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {METRICS_TABLE} ADD COLUMN {column} {column_type};")
+            conn.executemany(
+                f"INSERT INTO {METRICS_TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)});",
+                [tuple(r[c] for c in columns) for r in self.records],
+            )
+        conn.close()
+
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a') as f:
+                for record in self.records:
+                    f.write(json.dumps(record) + '\n')
+        self.records = []
@@ -1,34 +1,187 @@
-import sqlite3
-import pandas as pd
+import storage
+from instrumentation import MetricsRecorder
+
+metrics = MetricsRecorder('join_predictions')
 # Paths to the databases
 pred_db_path = 'predictions/predictions.db'
 actual_db_path = 'nifty50_data_v1.db'
 join_db_path = 'join_pred.db'
 
-def join_tables(pred_db_path, actual_db_path, join_db_path):
-    pred_conn = sqlite3.connect(pred_db_path)
-    actual_conn = sqlite3.connect(actual_db_path)
-    join_conn = sqlite3.connect(join_db_path)
+WATERMARK_TABLE = 'join_watermarks'
+
+# Raw Datetimes carry a UTC offset (e.g. '2024-12-26 10:20:00+05:30'); keep the local wall time
+ACTUAL_DATETIME = "substr(replace(a.Datetime, 'T', ' '), 1, 19)"
+CHANGED_DATETIME_T = "replace(c.Datetime, ' ', 'T')"
+
+
+def row_signature(conn, schema, table, rowid):
+    """
+    Return a text fingerprint of the row stored at a rowid, used to notice that
+    a source table was replaced even though its rowids kept growing.
+    """
+    row = conn.execute(f'SELECT * FROM {schema}."{table}" WHERE rowid=?;', (rowid,)).fetchone()
+    return repr(row)
+
+
+def get_marks(conn, joined_table):
+    """
+    Return the source high-water marks a joined table is up to date with.
+    Args:
+        conn (sqlite3.Connection): Connection to the join database.
+        joined_table (str): Name of the joined table.
+    Returns:
+        tuple: (actual_rowid, actual_signature, pred_rowid, pred_signature),
+            or None if the table has never been joined.
+    """
+    table_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (joined_table,)).fetchone()
+    row = conn.execute(
+        f"SELECT actual_rowid, actual_signature, pred_rowid, pred_signature FROM {WATERMARK_TABLE} WHERE table_name=?;",
+        (joined_table,),
+    ).fetchone()
+    return row if table_exists is not None else None
+
+
+def set_marks(conn, joined_table, marks):
+    """
+    Record the source high-water marks a joined table has been brought up to.
+    Runs inside the caller's transaction.
+    """
+    conn.execute(
+        f"INSERT OR REPLACE INTO {WATERMARK_TABLE} (table_name, actual_rowid, actual_signature, pred_rowid, pred_signature) "
+        "VALUES (?, ?, ?, ?, ?);",
+        (joined_table, *marks),
+    )
 
-    pred_tables = [t for t in pd.read_sql("SELECT name FROM sqlite_master WHERE type='table';", pred_conn)['name'].tolist() if t != 'sqlite_sequence']
-    actual_tables = [t for t in pd.read_sql("SELECT name FROM sqlite_master WHERE type='table';", actual_conn)['name'].tolist() if t != 'sqlite_sequence']
+
+def create_joined_table(conn, joined_table, actual_table, pred_table):
+    """
+    Create a joined table with the actual table's columns followed by the predicted
+    columns, and a unique index on Datetime for upserts.
+    Returns:
+        list: Column names of the joined table.
+    """
+    actual_columns = [(name, col_type or 'REAL') for _, name, col_type, *_ in conn.execute(f'PRAGMA actual.table_info("{actual_table}");')]
+    pred_columns = [(name, col_type or 'REAL') for _, name, col_type, *_ in conn.execute(f'PRAGMA pred.table_info("{pred_table}");') if name != 'Datetime']
+    columns = [(name, 'TEXT' if name == 'Datetime' else col_type) for name, col_type in actual_columns + pred_columns]
+    conn.execute(f'DROP TABLE IF EXISTS "{joined_table}";')
+    conn.execute(f'CREATE TABLE "{joined_table}" ({", ".join(f"{chr(34)}{n}{chr(34)} {t}" for n, t in columns)});')
+    storage.ensure_datetime_index(conn, joined_table, unique=True)
+    return [name for name, _ in columns]
+
+
+def upsert_joined_rows(conn, joined_table, actual_table, pred_table, columns, actual_mark=None, pred_mark=None):
+    """
+    Join actual bars with their predictions in SQL and upsert the result.
+    For each Datetime the last written actual row and the last written
+    prediction are kept. With marks given, only Datetimes that gained a new
+    actual row or a new prediction since those rowids are recomputed.
+    Returns:
+        int: Number of joined rows inserted or updated.
+    """
+    pred_names = {name for (_, name, *_) in conn.execute(f'PRAGMA pred.table_info("{pred_table}");')}
+    select = ', '.join(
+        ACTUAL_DATETIME if name == 'Datetime' else f'p."{name}"' if name in pred_names else f'a."{name}"'
+        for name in columns
+    )
+    names = ', '.join(f'"{name}"' for name in columns)
+    updates = ', '.join(f'"{name}"=excluded."{name}"' for name in columns if name != 'Datetime')
+    if actual_mark is None:
+        rows = (f'SELECT MAX(rid) FROM (SELECT a.rowid AS rid, {ACTUAL_DATETIME} AS Datetime '
+                f'FROM actual."{actual_table}" a) GROUP BY Datetime')
+    else:
+        # Latest actual row of each Datetime that gained a new actual bar; new rowids exceed all old ones
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS latest (Datetime TEXT PRIMARY KEY, rid INTEGER);")
+        conn.execute("DELETE FROM temp.latest;")
+        conn.execute(
+            f'INSERT INTO temp.latest SELECT {ACTUAL_DATETIME}, MAX(a.rowid) FROM actual."{actual_table}" a '
+            f'WHERE a.rowid > ? GROUP BY 1;',
+            (actual_mark,),
+        )
+        # and of each other Datetime that gained a prediction, looked up through the actual Datetime index.
+        # Raw Datetimes start with the wall time, with a space or a 'T' before the hour.
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS changed (Datetime TEXT PRIMARY KEY);")
+        conn.execute("DELETE FROM temp.changed;")
+        conn.execute(
+            f'INSERT OR IGNORE INTO temp.changed SELECT Datetime FROM pred."{pred_table}" '
+            f'WHERE rowid > ? AND Datetime NOT IN (SELECT Datetime FROM temp.latest);',
+            (pred_mark,),
+        )
+        conn.execute(
+            f'INSERT INTO temp.latest SELECT c.Datetime, MAX(a.rowid) FROM temp.changed c CROSS JOIN actual."{actual_table}" a '
+            f'WHERE ((a.Datetime >= c.Datetime AND a.Datetime < c.Datetime || char(126)) '
+            f'OR (a.Datetime >= {CHANGED_DATETIME_T} AND a.Datetime < {CHANGED_DATETIME_T} || char(126))) '
+            f'AND {ACTUAL_DATETIME} = c.Datetime GROUP BY c.Datetime;'
+        )
+        rows = 'SELECT rid FROM temp.latest'
+
+    return conn.execute(
+        f'INSERT INTO "{joined_table}" ({names}) '
+        f'SELECT {select} FROM actual."{actual_table}" a '
+        f'JOIN pred."{pred_table}" p ON p.rowid = (SELECT MAX(rowid) FROM pred."{pred_table}" WHERE Datetime = {ACTUAL_DATETIME}) '
+        f'WHERE a.rowid IN ({rows}) '
+        f'ON CONFLICT(Datetime) DO UPDATE SET {updates};'
+    ).rowcount
+
+
+def join_tables(pred_db_path, actual_db_path, join_db_path, full_rebuild=False, tickers=None):
+    """
+    Join each ticker's actual bars with its predictions into <ticker>_joined.
+    Tables are brought up to date incrementally from per-ticker rowid
+    high-water marks on both sources; a table is rebuilt from scratch when it
+    has never been joined, when a source table was rebuilt (its rowids went
+    backwards), or when full_rebuild is set.
+    tickers, if given, limits the join to those ticker tables.
+    """
+    join_conn = storage.connect(join_db_path)
+    join_conn.execute("ATTACH DATABASE ? AS actual;", (actual_db_path,))
+    join_conn.execute("ATTACH DATABASE ? AS pred;", (pred_db_path,))
+    join_conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (table_name TEXT PRIMARY KEY, "
+        "actual_rowid INTEGER NOT NULL, actual_signature TEXT, pred_rowid INTEGER NOT NULL, pred_signature TEXT);"
+    )
+
+    pred_tables = [t for (t,) in join_conn.execute("SELECT name FROM pred.sqlite_master WHERE type='table';") if t.endswith('_predictions')]
+    actual_tables = [t for (t,) in join_conn.execute("SELECT name FROM actual.sqlite_master WHERE type='table';") if t != 'sqlite_sequence']
 
     for pred_table in pred_tables:
         actual_table = pred_table.replace('_predictions', '')
-        if actual_table in actual_tables:
-            pred_df = pd.read_sql(f"SELECT * FROM {pred_table};", pred_conn)
-            actual_df = pd.read_sql(f"SELECT * FROM {actual_table};", actual_conn)
+        if actual_table not in actual_tables or (tickers is not None and actual_table not in tickers):
+            continue
+        joined_table = f'{actual_table}_joined'
+
+        actual_max = join_conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM actual."{actual_table}";').fetchone()[0]
+        pred_max = join_conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM pred."{pred_table}";').fetchone()[0]
+        new_marks = (actual_max, row_signature(join_conn, 'actual', actual_table, actual_max),
+                     pred_max, row_signature(join_conn, 'pred', pred_table, pred_max))
+        marks = None if full_rebuild else get_marks(join_conn, joined_table)
 
-            pred_df['Datetime'] = pd.to_datetime(pred_df['Datetime'], errors='coerce').dt.tz_localize(None)
-            actual_df['Datetime'] = pd.to_datetime(actual_df['Datetime'], errors='coerce').dt.tz_localize(None)
+        if marks is not None and tuple(marks) == new_marks:
+            continue
+        # A source table was replaced if the rows at the old marks are gone or different
+        rebuilt = marks is None or (
+            row_signature(join_conn, 'actual', actual_table, marks[0]) != marks[1]
+            or row_signature(join_conn, 'pred', pred_table, marks[2]) != marks[3]
+        )
 
-            joined_df = pd.merge(actual_df, pred_df, on='Datetime', how='inner')
-            joined_df.drop_duplicates(subset=['Datetime'], inplace=True, keep='last')
-            joined_df.to_sql(f'{actual_table}_joined', join_conn, if_exists='replace', index=False)
+        with metrics.stage('rebuild' if rebuilt else 'upsert', ticker=actual_table) as m, join_conn:
+            join_conn.execute("BEGIN;")
+            # Each new actual bar looks up its prediction by Datetime, and each new prediction its actual bar
+            storage.ensure_datetime_index(join_conn, pred_table, schema='pred')
+            storage.ensure_datetime_index(join_conn, actual_table, schema='actual')
+            if rebuilt:
+                columns = create_joined_table(join_conn, joined_table, actual_table, pred_table)
+                m['rows'] = upsert_joined_rows(join_conn, joined_table, actual_table, pred_table, columns)
+            else:
+                columns = [name for (_, name, *_) in join_conn.execute(f'PRAGMA main.table_info("{joined_table}");')]
+                m['rows'] = upsert_joined_rows(join_conn, joined_table, actual_table, pred_table, columns,
+                                               actual_mark=marks[0], pred_mark=marks[2])
+            set_marks(join_conn, joined_table, new_marks)
 
-    pred_conn.close()
-    actual_conn.close()
+    join_conn.execute("DETACH DATABASE actual;")
+    join_conn.execute("DETACH DATABASE pred;")
     join_conn.close()
+    metrics.flush()
 
-# Join the tables and store the result in join_pred.db
-join_tables(pred_db_path, actual_db_path, join_db_path)
+if __name__ == "__main__":
+    # Join the tables and store the result in join_pred.db
+    join_tables(pred_db_path, actual_db_path, join_db_path)
@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pandas as pd
+
+# NSE cash market session, in minutes after midnight (9:15 AM to 3:30 PM)
+MARKET_OPEN_MINUTES = 9 * 60 + 15
+MARKET_CLOSE_MINUTES = 15 * 60 + 30
+BAR_MINUTES = 5
+BARS_PER_SESSION = (MARKET_CLOSE_MINUTES - MARKET_OPEN_MINUTES) // BAR_MINUTES
+
+# NSE trading holidays falling on weekdays. Extend this list as the exchange
+# publishes new calendars, pass your own to the functions below, or point
+# NSE_HOLIDAYS_FILE at a file of YYYY-MM-DD dates (one per line, # comments
+# allowed) to use those instead without a code change.
+NSE_HOLIDAYS = [
+    '2024-01-22', '2024-01-26', '2024-03-08', '2024-03-25', '2024-03-29',
+    '2024-04-11', '2024-04-17', '2024-05-01', '2024-05-20', '2024-06-17',
+    '2024-07-17', '2024-08-15', '2024-10-02', '2024-11-01', '2024-11-15',
+    '2024-11-20', '2024-12-25',
+    '2025-02-26', '2025-03-14', '2025-03-31', '2025-04-10', '2025-04-14',
+    '2025-04-18', '2025-05-01', '2025-08-15', '2025-08-27', '2025-10-02',
+    '2025-10-21', '2025-10-22', '2025-11-05', '2025-12-25',
+    '2026-01-15', '2026-01-26', '2026-03-03', '2026-03-26', '2026-03-31',
+    '2026-04-03', '2026-04-14', '2026-05-01', '2026-05-28', '2026-06-26',
+    '2026-09-14', '2026-10-02', '2026-10-20', '2026-11-10', '2026-11-24',
+    '2026-12-25',
+]
+
+
+def load_holidays(path):
+    """Read holiday dates from a file with one YYYY-MM-DD date per line."""
+    with open(path) as f:
+        lines = (line.split('#', 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+def default_holidays():
+    """The dates in NSE_HOLIDAYS_FILE if that is set, else NSE_HOLIDAYS."""
+    path = os.environ.get('NSE_HOLIDAYS_FILE')
+    return load_holidays(path) if path else NSE_HOLIDAYS
+
+
+def _holiday_array(holidays):
+    return np.array(default_holidays() if holidays is None else holidays, dtype='datetime64[D]')
+
+
+def add_session_bars(base_times, steps, holidays=None):
+    """
+    Move timestamps forward by a number of 5-minute bars, counting only bars
+    inside the trading session on trading days.
+    A base time before the open counts as the bar before the open, and one at or
+    after the close, or on a weekend or holiday, as the last bar of the previous
+    session, so a single step lands on the next session's 9:15 AM bar.
+    Args:
+        base_times (array-like): Naive timestamps, shape (N,).
+        steps (array-like): Bar offsets, broadcastable against base_times[:, None].
+        holidays (list): Holiday dates. Defaults to default_holidays().
+    Returns:
+        np.ndarray: datetime64[ns] array of shape (N, len(steps)).
+    """
+    holidays = _holiday_array(holidays)
+    base = pd.DatetimeIndex(base_times).values.astype('datetime64[ns]')
+    days = base.astype('datetime64[D]')
+    minutes = (base - days).astype('timedelta64[m]').astype(np.int64)
+
+    offset = minutes - MARKET_OPEN_MINUTES
+    bar = np.floor_divide(offset, BAR_MINUTES)
+    # Keep sub-bar offsets for in-session times so unaligned timestamps shift by whole bars
+    remainder = np.where((bar >= 0) & (bar < BARS_PER_SESSION), offset - bar * BAR_MINUTES, 0)
+    bar = np.clip(bar, -1, BARS_PER_SESSION - 1)
+
+    trading_day = np.is_busday(days, holidays=holidays)
+    bar = np.where(trading_day, bar, BARS_PER_SESSION - 1)
+    session_days = np.busday_offset(days, 0, roll='backward', holidays=holidays)
+
+    total = bar[:, None] + np.asarray(steps, dtype=np.int64)[None, :]
+    day_shift, new_bar = np.divmod(total, BARS_PER_SESSION)
+    new_days = np.busday_offset(np.broadcast_to(session_days[:, None], total.shape), day_shift,
+                                roll='forward', holidays=holidays)
+
+    minutes_into_day = MARKET_OPEN_MINUTES + new_bar * BAR_MINUTES + remainder[:, None]
+    return new_days.astype('datetime64[ns]') + minutes_into_day.astype('timedelta64[m]')
+
+
+def future_session_times(base_times, n_future, holidays=None):
+    """
+    Timestamps of the next n_future session bars after each base time.
+    Args:
+        base_times (array-like): Naive timestamps, shape (N,).
+        n_future (int): Number of bars to step forward.
+        holidays (list): Holiday dates. Defaults to default_holidays().
+    Returns:
+        np.ndarray: datetime64[ns] array of shape (N, n_future).
+    """
+    return add_session_bars(base_times, np.arange(1, n_future + 1), holidays=holidays)
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+import pandas as pd
+import joblib
+import tensorflow as tf
+
+
+# A loaded model with its scaler and a traced inference function
+LoadedModel = namedtuple('LoadedModel', ['model', 'scaler', 'predict'])
+
+
+def make_predict_fn(model):
+    """
+    Trace the model's forward pass once so repeated single-window calls skip
+    eager op dispatch and model.predict's per-call setup.
+    """
+    input_shape = model.inputs[0].shape
+    return tf.function(lambda x: model(x, training=False),
+                       input_signature=[tf.TensorSpec((None, *input_shape[1:]), tf.float32)])
+
+
+class ModelCache:
+    """
+    Least-recently-used cache of per-ticker models and scalers for a long-lived
+    prediction service. An entry is reloaded when its model or scaler file
+    changes on disk (e.g. after the nightly training run).
+
+    Args:
+        models_dir (str): Directory holding <ticker>_model.h5 and <ticker>_scaler.pkl.
+        max_size (int): Maximum number of tickers kept loaded.
+    """
+
+    def __init__(self, models_dir='models', max_size=8):
+        self.models_dir = models_dir
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def paths(self, table_name):
+        return (os.path.join(self.models_dir, f'{table_name}_model.h5'),
+                os.path.join(self.models_dir, f'{table_name}_scaler.pkl'))
+
+    def get(self, table_name):
+        """
+        Return the model and scaler for a ticker, loading them if needed.
+        Args:
+            table_name (str): Name of the ticker table.
+        Returns:
+            LoadedModel: Model, scaler and traced inference function.
+        Raises:
+            FileNotFoundError: If the model or scaler does not exist.
+        """
+        model_path, scaler_path = self.paths(table_name)
+        mtimes = (os.path.getmtime(model_path), os.path.getmtime(scaler_path))
+        with self._lock:
+            entry = self._entries.get(table_name)
+            if entry is not None and entry[0] == mtimes:
+                self._entries.move_to_end(table_name)
+                return entry[1]
+
+            model = tf.keras.models.load_model(model_path, compile=False)
+            loaded = LoadedModel(model, joblib.load(scaler_path), make_predict_fn(model))
+            self._entries[table_name] = (mtimes, loaded)
+            self._entries.move_to_end(table_name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return loaded
+
+    def loaded(self):
+        with self._lock:
+            return list(self._entries)
+
+
+def forecast_window(loaded, window):
+    """
+    Forecast the next n_future bars from a single unscaled input window.
+    Args:
+        loaded (LoadedModel): Entry returned by ModelCache.get.
+        window (np.ndarray): Raw OHLCV rows of shape (n_steps, F).
+    Returns:
+        np.ndarray: Unscaled forecasts of shape (n_future, F).
+    """
+    scaler = loaded.scaler
+    window = pd.DataFrame(np.asarray(window, dtype=np.float64), columns=getattr(scaler, 'feature_names_in_', None))
+    scaled = scaler.transform(window).astype(np.float32)
+    prediction = loaded.predict(tf.constant(scaled[None])).numpy()[0]
+    return scaler.inverse_transform(prediction)
@@ -0,0 +1,76 @@
+import os
+import numpy as np
+
+# Environment variables read by performance_config, with their defaults
+SETTINGS = {
+    'RNN_PERFORMANCE_MODE': '0',
+    'RNN_JIT_COMPILE': '0',
+    'RNN_UNROLL': '0',
+    'RNN_INTRA_OP_THREADS': '0',
+    'RNN_INTER_OP_THREADS': '0',
+    'RNN_TRAIN_BATCH_SIZE': '32',
+    'RNN_PREDICT_BATCH_SIZE': '1024',
+}
+
+
+def _setting(name):
+    return os.environ.get(name, SETTINGS[name])
+
+
+def performance_config(enabled=None):
+    """
+    Settings of the opt-in performance mode, read from the environment so CI
+    runners and laptops can be tuned without code changes.
+
+    In performance mode bars are scaled in float32 so windows reach TensorFlow
+    without a cast, TensorFlow thread pools are sized by RNN_INTRA_OP_THREADS
+    and RNN_INTER_OP_THREADS (0 leaves TensorFlow's choice), and batch sizes
+    come from RNN_TRAIN_BATCH_SIZE and RNN_PREDICT_BATCH_SIZE.
+    RNN_JIT_COMPILE=1 XLA-compiles the train step and predict function and
+    RNN_UNROLL=1 unrolls the RNN layers over the window. Both are off by
+    default: on CPU, XLA made the relu LSTM/GRU train several times slower
+    and unrolling made no difference; run
+    benchmark_pipeline.py --compare-performance to measure a given machine.
+
+    Args:
+        enabled (bool): Turn the mode on. Defaults to RNN_PERFORMANCE_MODE.
+    Returns:
+        dict or None: The settings, or None when the mode is off.
+    """
+    if enabled is None:
+        enabled = _setting('RNN_PERFORMANCE_MODE') == '1'
+    if not enabled:
+        return None
+    return {
+        'dtype': 'float32',
+        'jit_compile': _setting('RNN_JIT_COMPILE') == '1',
+        'unroll': _setting('RNN_UNROLL') == '1',
+        'intra_op_threads': int(_setting('RNN_INTRA_OP_THREADS')),
+        'inter_op_threads': int(_setting('RNN_INTER_OP_THREADS')),
+        'train_batch_size': int(_setting('RNN_TRAIN_BATCH_SIZE')),
+        'predict_batch_size': int(_setting('RNN_PREDICT_BATCH_SIZE')),
+    }
+
+
+def configure_threads(tf, config):
+    """
+    Size TensorFlow's thread pools from the performance settings. Must run
+    before TensorFlow executes its first op; later calls are ignored.
+    Args:
+        tf (module): The tensorflow module.
+        config (dict): Settings from performance_config, or None.
+    """
+    if config is None:
+        return
+    try:
+        if config['intra_op_threads']:
+            tf.config.threading.set_intra_op_parallelism_threads(config['intra_op_threads'])
+        if config['inter_op_threads']:
+            tf.config.threading.set_inter_op_parallelism_threads(config['inter_op_threads'])
+    except RuntimeError:
+        print("TensorFlow is already initialized; thread settings not applied.")
+
+
+def scaling_dtype(config):
+    """Dtype bars are scaled in: float32 in performance mode, float64 otherwise."""
+    return np.float32 if config is not None else np.float64
@@ -0,0 +1,247 @@
+import os
+import glob
+import json
+import hashlib
+import tempfile
+import pandas as pd
+import storage
+from feature_store import clean_bars
+from instrumentation import MetricsRecorder
+
+metrics = MetricsRecorder('pipeline')
+
+database_path = 'nifty50_data_v1.db'
+predictions_db_path = 'predictions/predictions.db'
+join_db_path = 'join_pred.db'
+STATE_PATH = 'pipeline_state.json'
+
+STAGES = ['train', 'export', 'predict', 'join', 'accuracy', 'readme', 'charts']
+DEFAULT_STAGES = STAGES
+
+# File digests computed in this process, keyed on (path, size, mtime)
+_digests = {}
+
+
+def file_digest(path):
+    """
+    SHA-256 of a file's bytes, plus its WAL file if there is one, or None if
+    it does not exist. Digests are reused while the size and mtime are unchanged.
+    A WAL checkpoint moves pages into the main file without changing the
+    data, so it can make an unchanged database look changed; that only costs
+    a rerun of stages that are incremental anyway.
+    """
+    paths = [p for p in (path, f'{path}-wal') if os.path.exists(p)]
+    if not paths:
+        return None
+    key = tuple((p, os.path.getsize(p), os.path.getmtime(p)) for p in paths)
+    if key not in _digests:
+        digest = hashlib.sha256()
+        for p in paths:
+            with open(p, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def joined_marks(path):
+    """
+    The source high-water marks join_predictions recorded for each joined
+    table, or None if the join database or its watermark table does not
+    exist. They change exactly when the joined rows do, unlike the database
+    file, which accuracy also writes its own tables into.
+    """
+    if not os.path.exists(path):
+        return None
+    import join_predictions
+
+    conn = storage.connect(path, read_only=True)
+    try:
+        if join_predictions.WATERMARK_TABLE not in storage.list_tables(conn):
+            return None
+        rows = conn.execute(f'SELECT * FROM {join_predictions.WATERMARK_TABLE} ORDER BY table_name;').fetchall()
+        return [list(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def model_mtimes(models_dir='models', patterns=('*.h5', '*.pkl', '*.tflite')):
+    """Modification times of the saved models, scalers and exports."""
+    paths = sorted(p for pattern in patterns for p in glob.glob(os.path.join(models_dir, pattern)))
+    return {os.path.basename(p): os.path.getmtime(p) for p in paths}
+
+
+def stage_inputs(stage, options):
+    """
+    Fingerprint of everything a stage reads. A stage is skipped when this
+    matches what it saw on its last successful run.
+    Args:
+        stage (str): Stage name.
+        options (dict): Pipeline options that change a stage's output.
+    Returns:
+        dict: JSON-serialisable fingerprint.
+    """
+    if stage == 'train':
+        return {'database': file_digest(database_path), 'multi_ticker': options['multi_ticker'],
+                'full_retrain': options['full_retrain']}
+    if stage == 'export':
+        return {'models': model_mtimes(patterns=('*_model.h5',))}
+    if stage == 'predict':
+        return {'database': file_digest(database_path), 'models': model_mtimes(),
+                'predictions': file_digest(predictions_db_path), 'backend': options['backend'],
+                'multi_ticker': options['multi_ticker']}
+    if stage == 'join':
+        return {'database': file_digest(database_path), 'predictions': file_digest(predictions_db_path)}
+    if stage == 'accuracy':
+        return {'joined': joined_marks(join_db_path)}
+    if stage == 'readme':
+        return {'predictions': file_digest(predictions_db_path), 'joined': file_digest(join_db_path)}
+    if stage == 'charts':
+        return {'database': file_digest(database_path), 'predictions': file_digest(predictions_db_path)}
+    raise ValueError(f"Unknown stage {stage!r}; expected one of {STAGES}")
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_bars(database_path):
+    """
+    Read and clean every ticker table once, for the stages that share it.
+    Args:
+        database_path (str): Source database.
+    Returns:
+        dict: Ticker table name to cleaned bars.
+    """
+    conn = storage.connect(database_path, read_only=True)
+    try:
+        return {table: clean_bars(pd.read_sql(f'SELECT * FROM "{table}";', conn))
+                for table in storage.list_tables(conn)}
+    finally:
+        conn.close()
+
+
+def run_stage(stage, options, shared):
+    """
+    Run one stage in this process. Modules are imported on first use, so a
+    run that skips training never imports TensorFlow for it.
+    Args:
+        stage (str): Stage name.
+        options (dict): Pipeline options.
+        shared (dict): In-memory state handed between stages; 'bars' holds the
+            cleaned per-ticker frames once a stage has needed them. With a
+            feature store nothing is shared: train and predict read its
+            memory maps directly.
+    """
+    store_dir = options['store_dir']
+    if stage in ('train', 'predict') and store_dir is None and 'bars' not in shared:
+        with metrics.stage('load_bars') as m:
+            shared['bars'] = load_bars(database_path)
+            m['rows'] = sum(len(df) for df in shared['bars'].values())
+
+    if stage == 'train':
+        import train_rnn
+        train_rnn.main(full_retrain=options['full_retrain'], multi_ticker=options['multi_ticker'],
+                       data=shared.get('bars'), store_dir=store_dir)
+    elif stage == 'export':
+        import export_tflite
+        export_tflite.main()
+    elif stage == 'predict':
+        import predict_rnn
+        predict_rnn.main(backend=options['backend'], multi_ticker=options['multi_ticker'], data=shared.get('bars'),
+                         store_dir=store_dir)
+    elif stage == 'join':
+        import join_predictions
+        join_predictions.join_tables(predictions_db_path, database_path, join_db_path)
+    elif stage == 'accuracy':
+        import accuracy
+        accuracy.update_accuracy(join_db_path)
+    elif stage == 'readme':
+        import update_readme
+        update_readme.update_readme()
+    elif stage == 'charts':
+        import generate_charts
+        generate_charts.generate_charts()
+
+
+def main(stages=None, force=False, backend='keras', store_dir=None, multi_ticker=False, full_retrain=False,
+         state_path=STATE_PATH):
+    """
+    Run pipeline stages in order in a single process.
+    Cleaned bars are read once and shared by train and predict, or read
+    from the feature store's memory maps when store_dir is set. Each stage's
+    inputs (database content hashes, model mtimes and options) are compared
+    with those recorded on its last successful run, and the stage is skipped
+    if they are unchanged.
+    Args:
+        stages (list): Stages to run, in pipeline order. Defaults to DEFAULT_STAGES.
+        force (bool): Run the stages even if their inputs are unchanged.
+        backend (str): Prediction backend, 'keras' or 'tflite'.
+        store_dir (str): Read cleaned bars through this feature store.
+        multi_ticker (bool): Train and predict with the shared multi-ticker model.
+        full_retrain (bool): Retrain every ticker from scratch.
+        state_path (str): Where the fingerprints of the last runs are kept.
+    Returns:
+        dict: Stage name to 'ran' or 'skipped'.
+    """
+    # Stage modules are imported after this, so every script's metrics share the run id
+    os.environ['PIPELINE_RUN_ID'] = metrics.run_id
+    stages = [s for s in STAGES if s in (stages or DEFAULT_STAGES)]
+    options = dict(backend=backend, store_dir=store_dir, multi_ticker=multi_ticker, full_retrain=full_retrain)
+    os.makedirs('models', exist_ok=True)
+    os.makedirs(os.path.dirname(predictions_db_path), exist_ok=True)
+    state = load_state(state_path)
+    shared = {}
+    results = {}
+    try:
+        for stage in stages:
+            if not force and state.get(stage) == stage_inputs(stage, options):
+                print(f"{stage}: inputs unchanged, skipped")
+                results[stage] = 'skipped'
+                continue
+            # Fingerprint before the run, so data landing while the stage runs is seen next time
+            inputs = stage_inputs(stage, options)
+            with metrics.stage(stage):
+                run_stage(stage, options, shared)
+            # Predict appends to the predictions it reads its watermarks from; record what it left there
+            if stage == 'predict':
+                inputs['predictions'] = file_digest(predictions_db_path)
+            state[stage] = inputs
+            save_state(state, state_path)
+            results[stage] = 'ran'
+            print(f"{stage}: done")
+    finally:
+        metrics.flush()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run pipeline stages in one process, skipping stages whose inputs are unchanged.")
+    parser.add_argument('stages', nargs='*', metavar='STAGE',
+                        help=f"Stages to run, from {', '.join(STAGES)} (default: {' '.join(DEFAULT_STAGES)}).")
+    parser.add_argument('--force', action='store_true', help="Run the stages even if their inputs are unchanged.")
+    parser.add_argument('--backend', choices=['keras', 'tflite'], default='keras')
+    parser.add_argument('--feature-store', metavar='DIR', default=None,
+                        help="Read cleaned bars from a memory-mapped feature store in DIR (see feature_store.py).")
+    parser.add_argument('--multi-ticker', action='store_true',
+                        help="Train and predict with the shared multi-ticker model.")
+    parser.add_argument('--full-retrain', action='store_true', help="Retrain every ticker from scratch.")
+    parser.add_argument('--state', default=STATE_PATH, help="File holding the input fingerprints of past runs.")
+    args = parser.parse_args()
+    unknown = [s for s in args.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    main(stages=args.stages or None, force=args.force, backend=args.backend, store_dir=args.feature_store,
+         multi_ticker=args.multi_ticker, full_retrain=args.full_retrain, state_path=args.state)
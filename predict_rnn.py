@@ -2,31 +2,20 @@ import sqlite3
 import pandas as pd
 import numpy as np
 import os
+import sys
+import json
+import time
 import joblib
-import tensorflow as tf
-from datetime import time, timedelta
-
-def get_next_market_time(current_time):
-    """
-    Calculate the next valid market time.
-    If the current time exceeds 3:30 PM, move to the next trading day at 9:15 AM.
-    Args:
-        current_time (pd.Timestamp): Current time to check.
-    Returns:
-        pd.Timestamp: Adjusted time within market hours.
-    """
-    market_start = time(9, 15)  # Market opens at 9:15 AM
-    market_end = time(15, 30)  # Market closes at 3:30 PM
-
-    if current_time.time() >= market_end:  # After market close
-        # Move to the next trading day at 9:15 AM
-        next_day = current_time + pd.Timedelta(days=1)
-        return pd.Timestamp(next_day.date()) + pd.Timedelta(hours=9, minutes=15)
-    elif current_time.time() < market_start:  # Before market open
-        # Adjust to today's market start time
-        return pd.Timestamp(current_time.date()) + pd.Timedelta(hours=9, minutes=15)
-    return current_time
+import functools
+from instrumentation import MetricsRecorder
+from windowing import to_float32_matrix, sliding_windows, make_sequences
+from market_calendar import future_session_times
+from tflite_backend import tflite_path_for, is_current, TFLitePredictor
+from feature_store import FeatureStore, clean_bars
+from performance import performance_config, configure_threads, scaling_dtype
+import storage
 
+metrics = MetricsRecorder('predict_rnn')
 
 def preprocess_new_data(df):
     """
@@ -37,19 +26,7 @@ def preprocess_new_data(df):
     Returns:
         pd.DataFrame: Preprocessed DataFrame.
     """
-    # Convert 'Datetime' column to datetime format, removing timezone information
-    df['Datetime'] = pd.to_datetime(df['Datetime'], errors='coerce')
-    df['Datetime'] = df['Datetime'].dt.tz_localize(None)  # Remove timezone info
-    print("Datetime_test_data", df.tail())
-
-    # Remove rows with invalid or missing datetime values
-    df.dropna(subset=['Datetime'], inplace=True)
-
-    # Remove duplicates and sort by datetime
-    df.drop_duplicates(subset=['Datetime'], inplace=True)
-    df.sort_values('Datetime', inplace=True)
-
-    return df
+    return clean_bars(df)
 
 
 def create_sequences(data, input_columns, n_steps):
@@ -60,71 +37,594 @@ def create_sequences(data, input_columns, n_steps):
         input_columns (list): Columns to be used as input features.
         n_steps (int): Number of timesteps for input sequence.
     Returns:
-        np.ndarray: Input sequences for prediction.
-    """
-    X = []
-    for i in range(len(data) - n_steps):
-        X.append(data[input_columns].iloc[i:i+n_steps].values)
-    return np.array(X)
-
-def save_predictions_to_db(predictions, datetimes, db_path, table_name, scaler):
-    """
-    Save predictions for multiple future steps, ensuring times are within market hours.
-    """
-    predictions = scaler.inverse_transform(predictions.reshape(-1, predictions.shape[2])).reshape(predictions.shape)
-    conn = sqlite3.connect(db_path)
-    rows = []
-
-    for i, datetime in enumerate(datetimes):
-        base_datetime = datetime
-        for step in range(predictions.shape[1]):
-            # Calculate the next prediction time
-            next_time = base_datetime + pd.Timedelta(minutes=5 * (step + 1))
-            next_time = get_next_market_time(next_time)
-
-            rows.append({
-                'Datetime': next_time,
-                'Predicted_Open': predictions[i, step, 0],
-                'Predicted_High': predictions[i, step, 1],
-                'Predicted_Low': predictions[i, step, 2],
-                'Predicted_Close': predictions[i, step, 3],
-                'Predicted_Volume': predictions[i, step, 4],
-            })
-
-    pd.DataFrame(rows).to_sql(table_name, conn, if_exists='replace', index=False)
+        np.ndarray: Input sequences for prediction as a float32 strided view.
+    """
+    values = to_float32_matrix(data, input_columns)
+    return sliding_windows(values, n_steps, count=len(data) - n_steps)
+
+
+def scale_windows(df, scaler, input_columns, n_steps, performance=None):
+    """
+    Scale a ticker's bars in place and cut them into input windows. In
+    performance mode the bars are scaled as float32, so the windows need no
+    further cast or copy.
+    Returns:
+        np.ndarray: Input windows of shape (len(df) - n_steps, n_steps, F).
+    """
+    df[input_columns] = scaler.transform(df[input_columns].astype(scaling_dtype(performance)))
+    return create_sequences(df, input_columns, n_steps)
+
+WATERMARK_TABLE = 'prediction_watermarks'
+
+
+def get_watermark(conn, table_name):
+    """
+    Return the last base Datetime predicted for a predictions table.
+    Args:
+        conn (sqlite3.Connection): Connection to the predictions database.
+        table_name (str): Name of the predictions table.
+    Returns:
+        pd.Timestamp or None: The watermark, or None if no incremental state exists.
+    """
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (table_name TEXT PRIMARY KEY, last_datetime TEXT NOT NULL);")
+    table_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (table_name,)).fetchone()
+    row = conn.execute(f"SELECT last_datetime FROM {WATERMARK_TABLE} WHERE table_name=?;", (table_name,)).fetchone()
+    if table_exists is None or row is None:
+        return None
+    return pd.Timestamp(row[0])
+
+
+def set_watermark(conn, table_name, last_datetime):
+    """
+    Record the last base Datetime predicted for a predictions table.
+    Args:
+        conn (sqlite3.Connection): Connection to the predictions database.
+        table_name (str): Name of the predictions table.
+        last_datetime (pd.Timestamp): Latest base Datetime that has been predicted.
+    """
+    # --full-rebuild never calls get_watermark, so the table may not exist yet
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (table_name TEXT PRIMARY KEY, last_datetime TEXT NOT NULL);")
+    conn.execute(
+        f"INSERT INTO {WATERMARK_TABLE} (table_name, last_datetime) VALUES (?, ?) "
+        "ON CONFLICT(table_name) DO UPDATE SET last_datetime=excluded.last_datetime;",
+        (table_name, pd.Timestamp(last_datetime).strftime('%Y-%m-%d %H:%M:%S')),
+    )
+    conn.commit()
+
+
+def load_rows_since(conn, table_name, watermark, n_steps):
+    """
+    Load the bars newer than the watermark plus the n_steps bars before it,
+    which are needed to build the first new input window.
+    Rows are prefiltered on the raw Datetime text; callers still run
+    preprocess_new_data and compare against the parsed watermark.
+    Args:
+        conn (sqlite3.Connection): Connection to the source database.
+        table_name (str): Name of the ticker table.
+        watermark (pd.Timestamp): Last base Datetime already predicted.
+        n_steps (int): Number of timesteps for input sequence.
+    Returns:
+        pd.DataFrame: Raw rows, unsorted.
+    """
+    watermark = watermark.strftime('%Y-%m-%d %H:%M:%S')
+    query = (
+        f"SELECT * FROM (SELECT * FROM {table_name} WHERE Datetime < ? "
+        f"GROUP BY Datetime ORDER BY Datetime DESC LIMIT ?) "
+        f"UNION ALL SELECT * FROM {table_name} WHERE Datetime >= ?;"
+    )
+    return pd.read_sql(query, conn, params=(watermark, n_steps, watermark))
+
+
+def import_tensorflow():
+    """
+    Import TensorFlow on first use, so runs served entirely by the TFLite
+    backend (with tflite_runtime installed) never pay for it.
+    """
+    if 'tensorflow' not in sys.modules:
+        with metrics.stage('import_tensorflow'):
+            import tensorflow
+    return sys.modules['tensorflow']
+
+
+def load_predictor(model_path, backend='keras', performance=None):
+    """
+    Load the inference function for a ticker's model.
+    Args:
+        model_path (str): Path to the Keras .h5 model.
+        backend (str): 'keras', or 'tflite' to run the model's export from
+            export_tflite.py. Falls back to Keras when the export is missing
+            or older than the .h5 model.
+        performance (dict): Performance-mode settings (see performance.py):
+            batch size and threads, and XLA compilation of Keras predict.
+    Returns:
+        callable: Maps scaled windows (N, n_steps, F) to predictions (N, n_future, F).
+    """
+    tflite_path = tflite_path_for(model_path)
+    if backend == 'tflite':
+        if is_current(tflite_path, model_path):
+            if performance is None:
+                return TFLitePredictor(tflite_path).predict
+            return TFLitePredictor(tflite_path, batch_size=performance['predict_batch_size'],
+                                   num_threads=performance['intra_op_threads'] or None).predict
+        print(f"No current TFLite export at {tflite_path}. Using Keras...")
+    tf = import_tensorflow()
+    if performance is None:
+        return tf.keras.models.load_model(model_path).predict
+    model = tf.keras.models.load_model(model_path, compile=False)
+    model.compile(jit_compile=performance['jit_compile'])
+    return functools.partial(model.predict, batch_size=performance['predict_batch_size'], verbose=0)
+
+
+def save_predictions_to_db(predictions, datetimes, db_path, table_name, scaler, if_exists='replace'):
+    """
+    Save predictions for multiple future steps, stamped with the following
+    session bars (skipping nights, weekends and holidays).
+    Use if_exists='append' to add predictions for new bars to an existing table.
+    """
+    n_windows, n_future, n_features = predictions.shape
+    predictions = scaler.inverse_transform(predictions.reshape(-1, n_features))
+    frame = pd.DataFrame(predictions, columns=[f'Predicted_{c}' for c in ['Open', 'High', 'Low', 'Close', 'Volume']])
+    frame.insert(0, 'Datetime', future_session_times(datetimes, n_future).reshape(-1))
+
+    conn = storage.connect(db_path)
+    storage.write_frame(conn, table_name, frame, if_exists=if_exists)
+    conn.close()
+
+def load_new_bars(conn, table_name, watermark, n_steps, data=None):
+    """
+    Load the cleaned bars still to be predicted for a ticker, preceded by the
+    n_steps bars needed to build the first new input window.
+    Args:
+        conn (sqlite3.Connection): Connection to the source database.
+        table_name (str): Name of the ticker table.
+        watermark (pd.Timestamp): Last base Datetime already predicted, or None.
+        n_steps (int): Number of timesteps for input sequence.
+        data (dict): Already cleaned bars per ticker table, used instead of reading.
+    Returns:
+        pd.DataFrame or None: Bars to window, or None if there is nothing new.
+    """
+    if data is not None:
+        df = data[table_name]
+    else:
+        with metrics.stage('read', ticker=table_name) as m:
+            if watermark is None:
+                df = pd.read_sql(f"SELECT * FROM {table_name};", conn)
+            else:
+                df = load_rows_since(conn, table_name, watermark, n_steps)
+            m['rows'] = len(df)
+        with metrics.stage('preprocess', ticker=table_name) as m:
+            df = preprocess_new_data(df)
+            m['rows'] = len(df)
+    if watermark is None:
+        first_new = n_steps
+    else:
+        # Rows are sorted, so this is the position of the first bar after the watermark
+        first_new = max(int((df['Datetime'] <= watermark).sum()), n_steps)
+    if first_new >= len(df):
+        return None
+    return df.iloc[first_new - n_steps:].copy()
+
+
+def load_new_windows(conn, store, table_name, watermark, n_steps, scaler, input_columns, performance=None, data=None):
+    """
+    Scaled input windows for the bars still to be predicted for a ticker.
+    With a feature store the windows are cut straight from its memory map and
+    only the rows they cover are scaled; otherwise the bars are read from
+    SQLite (or taken from data) and scaled as a DataFrame.
+    Args:
+        conn (sqlite3.Connection): Connection to the source database.
+        store (FeatureStore): Synced feature store to read from, or None to read SQLite.
+        table_name (str): Name of the ticker table.
+        watermark (pd.Timestamp): Last base Datetime already predicted, or None.
+        n_steps (int): Number of timesteps for input sequence.
+        scaler (MinMaxScaler): Scaler the model was trained with.
+        input_columns (list): Columns to be used as input features.
+        performance (dict): Performance-mode settings, or None.
+        data (dict): Already cleaned bars per ticker table, used instead of reading.
+    Returns:
+        tuple or None: Windows of shape (N, n_steps, F) and the N base
+            Datetimes they forecast from, or None if there is nothing new.
+    """
+    if store is not None:
+        rows = store.rows(table_name)
+        first_new = n_steps if watermark is None else max(store.position_after(table_name, watermark), n_steps)
+        if first_new >= rows:
+            return None
+        with metrics.stage('windowing', ticker=table_name, rows=rows - first_new):
+            X = store.windows(table_name, n_steps, start=first_new - n_steps, count=rows - first_new,
+                              scaler=scaler, dtype=scaling_dtype(performance))
+        return X, np.array(store.datetimes(table_name)[first_new:])
+
+    df = load_new_bars(conn, table_name, watermark, n_steps, data)
+    if df is None:
+        return None
+    with metrics.stage('windowing', ticker=table_name) as m:
+        X = scale_windows(df, scaler, input_columns, n_steps, performance)
+        m['rows'] = len(X)
+    return X, df['Datetime'].to_numpy()[n_steps:]
+
+
+def load_multi_ticker_model(models_dir='models'):
+    """
+    Load the shared model written by train_rnn.py --multi-ticker.
+    Returns:
+        tuple: The Keras model and its metadata (ticker order, per-ticker scalers, window sizes).
+    Raises:
+        FileNotFoundError: If the shared model has not been trained.
+    """
+    model_path = os.path.join(models_dir, 'multi_ticker_model.h5')
+    meta_path = os.path.join(models_dir, 'multi_ticker_meta.pkl')
+    if not os.path.exists(model_path) or not os.path.exists(meta_path):
+        raise FileNotFoundError(f"No multi-ticker model in {models_dir}; train one with train_rnn.py --multi-ticker")
+    tf = import_tensorflow()
+    return tf.keras.models.load_model(model_path, compile=False), joblib.load(meta_path)
+
+
+def multi_ticker_inputs(meta, windows):
+    """
+    Stack windows from many tickers into the shared model's named inputs.
+    Returns:
+        tuple: The {'window', 'ticker'} inputs and the ticker order they are stacked in.
+    """
+    ticker_ids = {name: i for i, name in enumerate(meta['tickers'])}
+    names = list(windows)
+    X = np.concatenate([windows[name] for name in names])
+    ids = np.concatenate([np.full(len(windows[name]), ticker_ids[name], dtype=np.int32) for name in names])
+    return {'window': X, 'ticker': ids}, names
+
+
+def split_by_ticker(values, windows, names, axis=0):
+    """Split stacked outputs back into one array per ticker."""
+    bounds = np.cumsum([len(windows[name]) for name in names])[:-1]
+    return dict(zip(names, np.split(values, bounds, axis=axis)))
+
+
+def predict_multi_ticker(model, meta, windows):
+    """
+    Forecast windows from many tickers with the shared model in one batched call.
+    Args:
+        model (Model): Shared model from load_multi_ticker_model.
+        meta (dict): Its metadata.
+        windows (dict): Ticker table name to scaled windows of shape (N, n_steps, F).
+    Returns:
+        dict: Ticker table name to scaled predictions of shape (N, n_future, F).
+    """
+    inputs, names = multi_ticker_inputs(meta, windows)
+    predictions = model.predict(inputs, batch_size=1024, verbose=0)
+    return split_by_ticker(predictions, windows, names)
+
+
+SCENARIO_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def sample_forecasts(model, inputs, n_samples, batch_size=1024, quantiles=SCENARIO_QUANTILES, jit_compile=False):
+    """
+    Monte Carlo dropout: run n_samples forward passes per window with the
+    model's Dropout layers active, and summarise them per horizon step.
+    The samples are folded into the batch dimension: each call runs all
+    n_samples copies of batch_size // n_samples windows at once, instead of
+    calling predict n_samples times, and is reduced to its mean and quantiles
+    before the next call so memory does not grow with n_samples.
+    Args:
+        model (Model): Keras model with Dropout layers.
+        inputs (np.ndarray or dict): Scaled windows of shape (N, n_steps, F),
+            or the named inputs of the multi-ticker model.
+        n_samples (int): Forward passes per window.
+        batch_size (int): Windows x samples per call.
+        quantiles (tuple): Quantiles to report, between 0 and 1.
+        jit_compile (bool): XLA-compile the sampling function.
+    Returns:
+        tuple: Mean of shape (N, n_future, F) and quantiles of shape
+            (len(quantiles), N, n_future, F), in scaled units.
+    """
+    if n_samples < 1:
+        raise ValueError(f"n_samples must be at least 1; got {n_samples}")
+    tf = import_tensorflow()
+
+    def spec(values):
+        return tf.TensorSpec((None, *values.shape[1:]), values.dtype)
+
+    if isinstance(inputs, dict):
+        signature, n_windows = {name: spec(values) for name, values in inputs.items()}, len(inputs['window'])
+    else:
+        signature, n_windows = spec(inputs), len(inputs)
+
+    # training=True keeps Dropout active; the batch dimension is left open so
+    # the shorter last chunk does not trigger a second trace
+    @tf.function(input_signature=[signature], jit_compile=jit_compile, autograph=False)
+    def sample(batch):
+        return model(batch, training=True)
+
+    chunk = max(1, batch_size // n_samples)
+    means, bands = [], []
+    for start in range(0, n_windows, chunk):
+        # Each window's samples are consecutive rows of the batch
+        if isinstance(inputs, dict):
+            batch = {name: np.repeat(values[start:start + chunk], n_samples, axis=0) for name, values in inputs.items()}
+        else:
+            batch = np.repeat(inputs[start:start + chunk], n_samples, axis=0)
+        samples = np.asarray(sample(batch))
+        samples = samples.reshape(-1, n_samples, *samples.shape[1:])
+        means.append(samples.mean(axis=1))
+        bands.append(np.quantile(samples, quantiles, axis=1))
+    return np.concatenate(means), np.concatenate(bands, axis=1)
+
+
+def run_scenarios(label, model, inputs, n_windows, n_samples, config=None):
+    """
+    Time sample_forecasts and report its throughput in window-samples per second.
+    Returns:
+        tuple: Mean and quantiles from sample_forecasts.
+    """
+    batch_size = 1024 if config is None else config['predict_batch_size']
+    jit_compile = False if config is None else config['jit_compile']
+    with metrics.stage('scenarios', ticker=label, rows=n_windows * n_samples):
+        start = time.perf_counter()
+        mean, bands = sample_forecasts(model, inputs, n_samples, batch_size, jit_compile=jit_compile)
+        elapsed = time.perf_counter() - start
+    print(f"{label}: {n_windows} windows x {n_samples} samples in {elapsed:.2f}s "
+          f"({n_windows * n_samples / elapsed:,.0f} window-samples/s)")
+    return mean, bands
+
+
+def save_scenarios_to_db(mean, bands, datetimes, db_path, table_name, scaler, quantiles=SCENARIO_QUANTILES,
+                         if_exists='replace'):
+    """
+    Save the mean and quantile bands of sampled forecasts, one row per window
+    and horizon step, stamped like save_predictions_to_db. Columns are
+    Datetime, Step (1 to n_future) and Predicted_<field>_mean and
+    Predicted_<field>_p<q> per field. MinMax scaling is monotonic, so the
+    quantiles of the unscaled forecasts are the unscaled quantiles.
+    """
+    n_windows, n_future, n_features = mean.shape
+    frame = pd.DataFrame({
+        'Datetime': future_session_times(datetimes, n_future).reshape(-1),
+        'Step': np.tile(np.arange(1, n_future + 1), n_windows),
+    })
+    labels = ['mean'] + [f'p{round(q * 100)}' for q in quantiles]
+    for label, values in zip(labels, [mean, *bands]):
+        values = scaler.inverse_transform(values.reshape(-1, n_features))
+        for i, field in enumerate(['Open', 'High', 'Low', 'Close', 'Volume']):
+            frame[f'Predicted_{field}_{label}'] = values[:, i]
+
+    conn = storage.connect(db_path)
+    storage.write_frame(conn, table_name, frame, if_exists=if_exists)
     conn.close()
 
-def main():
-    database_path = 'nifty50_data_v1.db'
-    predictions_db_path = 'predictions/predictions.db'
+
+def main(full_rebuild=False, backend='keras', store_dir=None, multi_ticker=False, data=None, performance=None,
+         database_path='nifty50_data_v1.db', predictions_db_path='predictions/predictions.db', tickers=None, n_steps=12,
+         scenarios=0):
+    """
+    Predict the next n_future bars for every ticker table.
+    By default only bars newer than each table's watermark are predicted and
+    appended; tables without a watermark, or every table when full_rebuild is
+    set, are predicted from the start of their history and replaced.
+    Args:
+        full_rebuild (bool): Recompute and replace all predictions.
+        backend (str): 'keras' or 'tflite'; see load_predictor.
+        store_dir (str): Cut input windows straight from the memory maps of
+            this feature store (see feature_store.py), updating it first,
+            instead of reading SQLite. Ignored when data is given.
+        multi_ticker (bool): Forecast every ticker with the shared model from
+            train_rnn.py --multi-ticker in a single batched call.
+        data (dict): Already cleaned bars per ticker table (see pipeline.py);
+            read from the database or feature store if None.
+        performance (bool): Use the performance mode configured in
+            performance.py. Defaults to $RNN_PERFORMANCE_MODE.
+        database_path (str): Source database of ticker tables.
+        predictions_db_path (str): Database the predictions are written to.
+        tickers (list): Only predict these ticker tables. Defaults to every table.
+        n_steps (int): Number of timesteps in the input sequence the
+            per-ticker models were trained with; the multi-ticker model
+            records its own.
+        scenarios (int): When set, draw this many Monte Carlo dropout
+            samples per window (see sample_forecasts) and write their mean
+            and SCENARIO_QUANTILES bands to <ticker>_scenarios tables instead
+            of point forecasts. Always runs the Keras models, as the TFLite
+            exports are inference-only.
+    """
     input_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-    n_steps = 12
-    n_future = 3
+    if scenarios < 0:
+        raise ValueError(f"scenarios must be a positive number of samples, or 0 for point forecasts; got {scenarios}")
+    config = performance_config(performance)
+    if scenarios and backend == 'tflite':
+        print("TFLite exports have no active dropout; sampling scenarios with Keras...")
+        backend = 'keras'
+    suffix = '_scenarios' if scenarios else '_predictions'
+    if config is not None and (backend == 'keras' or multi_ticker):
+        # Thread pools can only be sized before TensorFlow runs its first op
+        configure_threads(import_tensorflow(), config)
 
     conn = sqlite3.connect(database_path)
-    tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table';", conn)['name'].tolist()
-    tables.remove('sqlite_sequence')
+    os.makedirs(os.path.dirname(predictions_db_path) or '.', exist_ok=True)
+    pred_conn = storage.connect(predictions_db_path)
+    if data is not None:
+        tables = list(data)
+    else:
+        tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table';", conn)['name'].tolist()
+        tables.remove('sqlite_sequence')
+    if tickers is not None:
+        tables = [table for table in tables if table in tickers]
+
+    store = None
+    if store_dir is not None and data is None:
+        store = FeatureStore(store_dir)
+        with metrics.stage('sync_feature_store') as m:
+            m['rows'] = sum(written for _, written in store.sync(database_path, tables).values())
+
+    if multi_ticker:
+        with metrics.stage('load_model'):
+            model, meta = load_multi_ticker_model()
+        n_steps = meta['n_steps']
+        pending = {}
+        for table_name in tables:
+            if table_name not in meta['scalers']:
+                print(f"{table_name} is not covered by the multi-ticker model. Skipping...")
+                continue
+            pred_table = f'{table_name}{suffix}'
+            watermark = None if full_rebuild else get_watermark(pred_conn, pred_table)
+            loaded = load_new_windows(conn, store, table_name, watermark, n_steps, meta['scalers'][table_name],
+                                      input_columns, config, data)
+            if loaded is None:
+                print(f"No new bars for {table_name}. Skipping...")
+                continue
+            X, base_times = loaded
+            pending[table_name] = (base_times, X, watermark)
+
+        windows = {name: X for name, (_, X, _) in pending.items()}
+        n_windows = sum(len(X) for X in windows.values())
+        if pending and scenarios:
+            inputs, names = multi_ticker_inputs(meta, windows)
+            mean, bands = run_scenarios('multi_ticker', model, inputs, n_windows, scenarios, config)
+            means, bands = split_by_ticker(mean, windows, names), split_by_ticker(bands, windows, names, axis=1)
+        elif pending:
+            with metrics.stage('inference', rows=n_windows):
+                predictions = predict_multi_ticker(model, meta, windows)
+        for table_name, (base_times, X, watermark) in pending.items():
+            pred_table = f'{table_name}{suffix}'
+            if_exists = 'replace' if watermark is None else 'append'
+            with metrics.stage('write', ticker=table_name, rows=len(X) * meta['n_future']):
+                if scenarios:
+                    save_scenarios_to_db(means[table_name], bands[table_name], base_times,
+                                         predictions_db_path, pred_table, meta['scalers'][table_name], if_exists=if_exists)
+                else:
+                    save_predictions_to_db(predictions[table_name], base_times, predictions_db_path,
+                                           pred_table, meta['scalers'][table_name], if_exists=if_exists)
+                set_watermark(pred_conn, pred_table, base_times[-1])
+    else:
+        for table_name in tables:
+            model_path = os.path.join('models', f'{table_name}_model.h5')
+            scaler_path = os.path.join('models', f'{table_name}_scaler.pkl')
 
-    for table_name in tables:
-        df = pd.read_sql(f"SELECT * FROM {table_name};", conn)
-        df = preprocess_new_data(df)
+            if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+                print(f"Model or scaler for {table_name} not found. Skipping...")
+                continue
 
+            pred_table = f'{table_name}{suffix}'
+            watermark = None if full_rebuild else get_watermark(pred_conn, pred_table)
+            scaler = joblib.load(scaler_path)
+            loaded = load_new_windows(conn, store, table_name, watermark, n_steps, scaler, input_columns, config, data)
+            if loaded is None:
+                print(f"No new bars for {table_name}. Skipping...")
+                continue
+            X, base_times = loaded
+
+            with metrics.stage('load_model', ticker=table_name):
+                if scenarios:
+                    model = import_tensorflow().keras.models.load_model(model_path, compile=False)
+                else:
+                    predict = load_predictor(model_path, backend, config)
+
+            if_exists = 'replace' if watermark is None else 'append'
+            if scenarios:
+                mean, bands = run_scenarios(table_name, model, X, len(X), scenarios, config)
+                with metrics.stage('write', ticker=table_name, rows=len(X) * mean.shape[1]):
+                    save_scenarios_to_db(mean, bands, base_times, predictions_db_path, pred_table, scaler,
+                                         if_exists=if_exists)
+                    set_watermark(pred_conn, pred_table, base_times[-1])
+                continue
+
+            with metrics.stage('inference', ticker=table_name, rows=len(X)):
+                predictions = predict(X)
+            with metrics.stage('write', ticker=table_name, rows=len(X) * predictions.shape[1]):
+                save_predictions_to_db(predictions, base_times, predictions_db_path, pred_table, scaler,
+                                       if_exists=if_exists)
+                set_watermark(pred_conn, pred_table, base_times[-1])
+    pred_conn.close()
+    conn.close()
+    metrics.flush()
+
+
+def compare_models(database_path='nifty50_data_v1.db', report_path='predictions/multi_ticker_report.json',
+                   n_windows=500):
+    """
+    Compare the shared multi-ticker model with the per-ticker models on each
+    ticker's most recent windows whose future bars are known, and write the
+    per-ticker errors (in price and volume units) to a JSON report.
+    Args:
+        database_path (str): Source database.
+        report_path (str): Where to write the report.
+        n_windows (int): Number of most recent windows evaluated per ticker.
+    Returns:
+        list: One dict of errors per ticker.
+    """
+    model, meta = load_multi_ticker_model()
+    tf = import_tensorflow()
+    input_columns = meta['input_columns']
+    n_steps, n_future = meta['n_steps'], meta['n_future']
+    close = input_columns.index('Close')
+    volume = input_columns.index('Volume')
+
+    conn = sqlite3.connect(database_path)
+    shared_windows, per_ticker, targets = {}, {}, {}
+    for table_name in meta['tickers']:
         model_path = os.path.join('models', f'{table_name}_model.h5')
         scaler_path = os.path.join('models', f'{table_name}_scaler.pkl')
-
         if not os.path.exists(model_path) or not os.path.exists(scaler_path):
             print(f"Model or scaler for {table_name} not found. Skipping...")
             continue
+        df = preprocess_new_data(pd.read_sql(f"SELECT * FROM {table_name};", conn))
+        df = df.iloc[-(n_windows + n_steps + n_future - 1):]
+        if len(df) < n_steps + n_future:
+            continue
+        raw = to_float32_matrix(df, input_columns)
+        _, targets[table_name] = make_sequences(raw, raw, n_steps, n_future)
 
-        model = tf.keras.models.load_model(model_path)
         scaler = joblib.load(scaler_path)
+        X, _ = make_sequences(scaler.transform(df[input_columns]).astype(np.float32), raw, n_steps, n_future)
+        scaled = tf.keras.models.load_model(model_path, compile=False).predict(X, batch_size=1024, verbose=0)
+        per_ticker[table_name] = scaler.inverse_transform(scaled.reshape(-1, len(input_columns))).reshape(scaled.shape)
 
-        df[input_columns] = scaler.transform(df[input_columns])
-        X = create_sequences(df, input_columns, n_steps)
-
-        predictions = model.predict(X)
-        # print("predictions",predictions)
-        save_predictions_to_db(predictions, df['Datetime'].iloc[n_steps:], predictions_db_path, f'{table_name}_predictions', scaler)
+        shared_scaled = meta['scalers'][table_name].transform(df[input_columns]).astype(np.float32)
+        shared_windows[table_name], _ = make_sequences(shared_scaled, raw, n_steps, n_future)
     conn.close()
+
+    report = []
+    shared = predict_multi_ticker(model, meta, shared_windows) if shared_windows else {}
+    for table_name, scaled in shared.items():
+        shared_scaler = meta['scalers'][table_name]
+        multi = shared_scaler.inverse_transform(scaled.reshape(-1, len(input_columns))).reshape(scaled.shape)
+        y = targets[table_name]
+        row = {'table': table_name, 'windows': len(y)}
+        for name, predictions in (('per_ticker', per_ticker[table_name]), ('multi_ticker', multi)):
+            errors = predictions - y
+            row[f'{name}_close_mae'] = float(np.abs(errors[..., close]).mean())
+            row[f'{name}_close_rmse'] = float(np.sqrt((errors[..., close] ** 2).mean()))
+            row[f'{name}_volume_mae'] = float(np.abs(errors[..., volume]).mean())
+        report.append(row)
+        print(f"{table_name}: close MAE per-ticker={row['per_ticker_close_mae']:.4f} "
+              f"multi-ticker={row['multi_ticker_close_mae']:.4f} over {row['windows']} windows")
+
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
 if __name__ == "__main__":
-    main()
+    import argparse
+    from cli import positive_int
+
+    parser = argparse.ArgumentParser(description="Predict future bars for every ticker table.")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="Recompute predictions from the start of history and replace existing tables.")
+    parser.add_argument('--backend', choices=['keras', 'tflite'], default='keras',
+                        help="Run models with Keras or their TFLite exports (see export_tflite.py).")
+    parser.add_argument('--feature-store', metavar='DIR', default=None,
+                        help="Read cleaned bars from a memory-mapped feature store in DIR (see feature_store.py).")
+    parser.add_argument('--multi-ticker', action='store_true',
+                        help="Forecast every ticker with the shared model from train_rnn.py --multi-ticker.")
+    parser.add_argument('--compare-models', action='store_true',
+                        help="Instead of predicting, report shared vs per-ticker model errors on recent bars.")
+    parser.add_argument('--performance', action='store_true', default=None,
+                        help="Float32 scaling and configured threads, batch size and XLA (see performance.py).")
+    parser.add_argument('--scenarios', type=positive_int, default=0, metavar='K',
+                        help="Draw K Monte Carlo dropout samples per window and write mean and p10/p50/p90 bands "
+                             "to <ticker>_scenarios tables instead of point forecasts.")
+    args = parser.parse_args()
+    if args.compare_models:
+        compare_models()
+    else:
+        main(full_rebuild=args.full_rebuild, backend=args.backend, store_dir=args.feature_store,
+             multi_ticker=args.multi_ticker, performance=args.performance, scenarios=args.scenarios)
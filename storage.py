@@ -0,0 +1,141 @@
+import sqlite3
+import pandas as pd
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def connect(db_path, read_only=False, check_same_thread=True):
+    """
+    Open a SQLite connection in WAL mode so readers (the dashboard, README
+    updates) are not blocked while predictions are being written.
+    Args:
+        db_path (str): Path to the database file.
+        read_only (bool): Open the file read-only and leave its journal mode untouched.
+        check_same_thread (bool): Set to False to share the connection across threads.
+    Returns:
+        sqlite3.Connection: Open connection.
+    """
+    if read_only:
+        return sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=check_same_thread)
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    return conn
+
+
+def list_tables(conn, suffix=''):
+    """
+    List user tables, skipping SQLite internals.
+    Args:
+        conn (sqlite3.Connection): Open connection.
+        suffix (str): Only return tables whose name ends with this suffix.
+    Returns:
+        list: Table names.
+    """
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name;")
+    return [name for (name,) in rows if name.endswith(suffix)]
+
+
+def format_datetimes(values):
+    """
+    Render timestamps as naive 'YYYY-MM-DD HH:MM:SS' text, which sorts and
+    compares correctly in SQLite.
+    Args:
+        values (array-like): Timestamps.
+    Returns:
+        pd.Index: Formatted strings.
+    """
+    values = pd.DatetimeIndex(values)
+    if values.tz is not None:
+        values = values.tz_localize(None)
+    return values.strftime(DATETIME_FORMAT)
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def ensure_datetime_index(conn, table, unique=False, schema='main'):
+    """
+    Create the index on Datetime that the ORDER BY / range queries rely on.
+    Args:
+        conn (sqlite3.Connection): Open connection.
+        table (str): Table name.
+        unique (bool): Enforce one row per Datetime.
+        schema (str): Name of the (possibly attached) database holding the table.
+    """
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    conn.execute(f'CREATE {kind} IF NOT EXISTS {schema}."{table}_Datetime_idx" ON "{table}" (Datetime);')
+
+
+def write_frame(conn, table, df, if_exists='append', unique=False):
+    """
+    Write a DataFrame with one executemany call inside a single transaction.
+    New tables get column types from the frame's dtypes (Datetime stored as
+    sortable text) and an index on Datetime.
+    Args:
+        conn (sqlite3.Connection): Open connection.
+        table (str): Table name.
+        df (pd.DataFrame): Rows to write; must contain a Datetime column.
+        if_exists (str): 'append' to add rows, 'replace' to drop and recreate the table.
+        unique (bool): Create the Datetime index as unique.
+    """
+    df = df.copy()
+    df['Datetime'] = format_datetimes(df['Datetime'])
+    columns = ', '.join(f'"{c}" {_sql_type(df[c].dtype)}' for c in df.columns)
+    placeholders = ', '.join('?' for _ in df.columns)
+    names = ', '.join(f'"{c}"' for c in df.columns)
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+    with conn:
+        conn.execute("BEGIN;")
+        if if_exists == 'replace':
+            conn.execute(f'DROP TABLE IF EXISTS "{table}";')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({columns});')
+        ensure_datetime_index(conn, table, unique=unique)
+        conn.executemany(f'INSERT INTO "{table}" ({names}) VALUES ({placeholders});', rows)
+
+
+def read_latest(conn, table, limit, one_per_datetime=False):
+    """
+    Read the most recent rows of a table, newest first, using the Datetime index.
+    Args:
+        conn (sqlite3.Connection): Open connection.
+        table (str): Table name.
+        limit (int): Maximum number of rows (or distinct Datetimes) to return.
+        one_per_datetime (bool): Keep only the last written row for each Datetime.
+    Returns:
+        pd.DataFrame: Rows ordered by Datetime descending.
+    """
+    if one_per_datetime:
+        query = (
+            f'SELECT t.* FROM "{table}" t JOIN '
+            f'(SELECT MAX(rowid) AS rid FROM "{table}" GROUP BY Datetime ORDER BY Datetime DESC LIMIT ?) latest '
+            f'ON t.rowid = latest.rid ORDER BY t.Datetime DESC;'
+        )
+    else:
+        query = f'SELECT * FROM "{table}" ORDER BY Datetime DESC LIMIT ?;'
+    return pd.read_sql(query, conn, params=(limit,))
+
+
+def read_range(conn, table, start, end):
+    """
+    Read the rows whose Datetime falls between start and end (inclusive, to the
+    second), oldest first, using the Datetime index.
+    The upper bound is exclusive at end + 1s so raw Datetimes carrying a UTC
+    offset suffix (e.g. '... 15:25:00+05:30') still match.
+    Args:
+        conn (sqlite3.Connection): Open connection.
+        table (str): Table name.
+        start (datetime): First Datetime to include.
+        end (datetime): Last Datetime to include.
+    Returns:
+        pd.DataFrame: Rows ordered by Datetime, then by write order.
+    """
+    lower, upper = format_datetimes([start, pd.Timestamp(end) + pd.Timedelta(seconds=1)])
+    query = f'SELECT * FROM "{table}" WHERE Datetime >= ? AND Datetime < ? ORDER BY Datetime, rowid;'
+    return pd.read_sql(query, conn, params=(lower, upper))
@@ -1,64 +1,69 @@
-import sqlite3
 import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 import datetime
+import os
+import storage
+from accuracy import read_accuracy
+
+actual_db_path = 'nifty50_data_v1.db'
+pred_db_path = 'predictions/predictions.db'
+join_db_path = 'join_pred.db'
+session_start = datetime.time(9, 15)
+session_end = datetime.time(15, 30)
+
+# One shared read-only connection per database for the lifetime of the server
+@st.cache_resource
+def get_connection(db_path):
+    return storage.connect(db_path, read_only=True, check_same_thread=False)
+
+def db_version(db_path):
+    """Modification time of a database (and its WAL), used as a cache key so cached queries expire when data changes."""
+    wal_path = f'{db_path}-wal'
+    return max(os.path.getmtime(p) for p in (db_path, wal_path) if os.path.exists(p))
 
 # Function to fetch table names from the database
-def fetch_table_names(db_path):
-    conn = sqlite3.connect(db_path)
-    tables = [t[0] for t in conn.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()]
-    conn.close()
-    return tables
+@st.cache_data
+def fetch_table_names(db_path, version):
+    return storage.list_tables(get_connection(db_path))
+
+@st.cache_data
+def fetch_time_bounds(table_name, version):
+    """Session-hours Datetime range covered by the ticker's last 60 bars."""
+    df = storage.read_latest(get_connection(actual_db_path), table_name, 60)
+    times = pd.to_datetime(df['Datetime'], errors='coerce').dt.tz_localize(None).dropna()
+    times = times[(times.dt.time >= session_start) & (times.dt.time <= session_end)]
+    return times.min().to_pydatetime(), times.max().to_pydatetime()
+
+@st.cache_data
+def fetch_range(db_path, table_name, start, end, version):
+    """Rows between start and end, one per Datetime (the last written), within session hours."""
+    df = storage.read_range(get_connection(db_path), table_name, start, end)
+    df['Datetime'] = pd.to_datetime(df['Datetime'], errors='coerce').dt.tz_localize(None)
+    df = df.drop_duplicates(subset=['Datetime'], keep='last')
+    return df[(df['Datetime'].dt.time >= session_start) & (df['Datetime'].dt.time <= session_end)]
+
+@st.cache_data
+def fetch_accuracy(version):
+    """Rolling accuracy metrics precomputed by accuracy.py."""
+    return read_accuracy(join_db_path)
 
 # Fetch available tables from both actual and predicted databases
-actual_db_path = 'nifty50_data_v1.db'
-pred_db_path = 'predictions/predictions.db'
-actual_tables = fetch_table_names(actual_db_path)
-pred_tables = fetch_table_names(pred_db_path)
+actual_tables = fetch_table_names(actual_db_path, db_version(actual_db_path))
+pred_tables = fetch_table_names(pred_db_path, db_version(pred_db_path))
 
 # Combine actual and predicted table names for selection
-table_options = list(set(actual_tables) & set([t.replace('_predictions', '') for t in pred_tables]))
+table_options = sorted(set(actual_tables) & set([t.replace('_predictions', '') for t in pred_tables]))
 
 # Create the dropdown menu for table selection
 selected_table = st.selectbox("Select Table", table_options)
 
 # Function to load the selected table's data and plot the candlestick chart
 def load_and_plot_data(selected_table):
-    # Connect to the databases
-    actual_conn = sqlite3.connect(actual_db_path)
-    pred_conn = sqlite3.connect(pred_db_path)
-
-    # Load the actual and predicted data based on selected table
-    actual_df = pd.read_sql(f"SELECT * FROM {selected_table} ORDER BY Datetime DESC LIMIT 60;", actual_conn)
-    pred_df = pd.read_sql(f"SELECT * FROM {selected_table}_predictions ORDER BY Datetime DESC LIMIT 60;", pred_conn)
+    actual_version = db_version(actual_db_path)
+    pred_version = db_version(pred_db_path)
+    min_time, max_time = fetch_time_bounds(selected_table, actual_version)
 
-    actual_conn.close()
-    pred_conn.close()
-
-    # Convert datetime columns to datetime format
-    actual_df['Datetime'] = pd.to_datetime(actual_df['Datetime'], errors='coerce').dt.tz_localize(None)
-    pred_df['Datetime'] = pd.to_datetime(pred_df['Datetime'], errors='coerce').dt.tz_localize(None)
-
-    # Drop duplicate entries in the 'Datetime' column
-    actual_df = actual_df.drop_duplicates(subset=['Datetime'])
-    pred_df = pred_df.drop_duplicates(subset=['Datetime'])
-
-    # Filter data to include only between 9:15 AM to 3:30 PM
-    actual_df['Time'] = actual_df['Datetime'].dt.time
-    pred_df['Time'] = pred_df['Datetime'].dt.time
-
-    # Filter rows for actual and predicted data within the given time range
-    actual_df = actual_df[(actual_df['Time'] >= pd.to_datetime("09:15:00").time()) & 
-                           (actual_df['Time'] <= pd.to_datetime("15:30:00").time())]
-
-    pred_df = pred_df[(pred_df['Time'] >= pd.to_datetime("09:15:00").time()) & 
-                       (pred_df['Time'] <= pd.to_datetime("15:30:00").time())]
-
-    # Convert the min and max times to native datetime objects
-    min_time = actual_df['Datetime'].min().to_pydatetime()
-    max_time = actual_df['Datetime'].max().to_pydatetime()
-    
     # Streamlit slider for time range selection, converting to datetime format
     time_range = st.slider(
         "Select Time Range", 
@@ -68,9 +73,9 @@ def load_and_plot_data(selected_table):
         format="YYYY-MM-DD HH:mm"
     )
 
-    # Filter data based on the selected time range from the slider
-    filtered_actual_df = actual_df[(actual_df['Datetime'] >= time_range[0]) & (actual_df['Datetime'] <= time_range[1])]
-    filtered_pred_df = pred_df[(pred_df['Datetime'] >= time_range[0]) & (pred_df['Datetime'] <= time_range[1])]
+    # Load only the selected time range from each database
+    filtered_actual_df = fetch_range(actual_db_path, selected_table, time_range[0], time_range[1], actual_version)
+    filtered_pred_df = fetch_range(pred_db_path, f'{selected_table}_predictions', time_range[0], time_range[1], pred_version)
 
     # Plot the candlestick chart using Plotly
     fig = go.Figure(data=[go.Candlestick(
@@ -120,6 +125,14 @@ def load_and_plot_data(selected_table):
 
     st.plotly_chart(fig)
 
+    # Rolling prediction accuracy, if accuracy.py has been run
+    if os.path.exists(join_db_path):
+        accuracy = fetch_accuracy(db_version(join_db_path))
+        if len(accuracy):
+            accuracy = accuracy[accuracy['table_name'] == selected_table]
+            st.subheader("Prediction accuracy")
+            st.dataframe(accuracy.pivot(index='field', columns='window', values=['mae', 'rmse', 'hit_rate']))
+
 # Load and display the data when a table is selected
 if selected_table:
     load_and_plot_data(selected_table)
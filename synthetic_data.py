@@ -0,0 +1,92 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from market_calendar import add_session_bars
+
+DEFAULT_TICKERS = ['RELIANCE_NS', 'TCS_NS', 'INFY_NS', 'HDFCBANK_NS', 'ICICIBANK_NS']
+
+
+def synthetic_bars(n_bars, start='2024-01-01 09:15:00', start_price=1000.0, seed=42):
+    """
+    Generate 5-minute OHLCV bars inside NSE session hours from a geometric random walk.
+    Args:
+        n_bars (int): Number of bars.
+        start (str): Datetime of the first bar.
+        start_price (float): Opening price of the first bar.
+        seed (int): Seed value for randomness.
+    Returns:
+        pd.DataFrame: Datetime (tz-aware, Asia/Kolkata), Open, High, Low, Close, Adj_Close, Volume.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    # Step from the bar before start so the first bar lands on start itself
+    times = add_session_bars([start - pd.Timedelta(minutes=5)], np.arange(1, n_bars + 1))[0]
+
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.0015, n_bars)))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, n_bars)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.integers(1_000, 200_000, n_bars)
+
+    return pd.DataFrame({
+        'Datetime': pd.DatetimeIndex(times).tz_localize('Asia/Kolkata'),
+        'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Adj_Close': close, 'Volume': volume,
+    })
+
+
+def write_database(db_path, tickers=None, n_bars=10_000, duplicate_rate=0.0, nat_rate=0.0,
+                   start='2024-01-01 09:15:00', seed=42):
+    """
+    Write a SQLite database with the same layout as nifty50_data_v1.db: one
+    AUTOINCREMENT table per ticker (so sqlite_sequence exists) holding Datetime
+    text with a UTC offset and OHLCV columns.
+    Args:
+        db_path (str): Path of the database to create or overwrite tables in.
+        tickers (list): Table names. Defaults to DEFAULT_TICKERS.
+        n_bars (int): Number of distinct bars per ticker.
+        duplicate_rate (float): Fraction of bars inserted a second time.
+        nat_rate (float): Fraction of extra rows with an unparseable Datetime.
+        start (str): Datetime of the first bar.
+        seed (int): Seed value for randomness.
+    """
+    tickers = DEFAULT_TICKERS if tickers is None else tickers
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    for i, ticker in enumerate(tickers):
+        df = synthetic_bars(n_bars, start=start, start_price=rng.uniform(200, 4000), seed=seed + i)
+        # Stored as e.g. '2024-01-01 09:15:00+05:30', like the upstream database
+        df['Datetime'] = df['Datetime'].astype(str)
+
+        duplicates = df.sample(frac=duplicate_rate, random_state=seed + i)
+        invalid = df.sample(frac=nat_rate, random_state=seed + i + 1).assign(Datetime='not a date')
+        df = pd.concat([df, duplicates, invalid]).sort_index(kind='stable')
+
+        conn.execute(f'DROP TABLE IF EXISTS "{ticker}";')
+        conn.execute(
+            f'CREATE TABLE "{ticker}" (Id INTEGER PRIMARY KEY AUTOINCREMENT, Datetime TEXT, Open REAL, '
+            'High REAL, Low REAL, Close REAL, Adj_Close REAL, Volume INTEGER);'
+        )
+        conn.executemany(
+            f'INSERT INTO "{ticker}" (Datetime, Open, High, Low, Close, Adj_Close, Volume) VALUES (?, ?, ?, ?, ?, ?, ?);',
+            df[['Datetime', 'Open', 'High', 'Low', 'Close', 'Adj_Close', 'Volume']].astype(object).itertuples(index=False, name=None),
+        )
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic nifty50_data_v1.db-style OHLCV database.")
+    parser.add_argument('db_path', nargs='?', default='synthetic_nifty50.db')
+    parser.add_argument('--tickers', nargs='+', default=DEFAULT_TICKERS)
+    parser.add_argument('--bars', type=int, default=10_000, help="Distinct bars per ticker.")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0)
+    parser.add_argument('--nat-rate', type=float, default=0.0)
+    parser.add_argument('--start', default='2024-01-01 09:15:00')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    write_database(args.db_path, tickers=args.tickers, n_bars=args.bars, duplicate_rate=args.duplicate_rate,
+                   nat_rate=args.nat_rate, start=args.start, seed=args.seed)
+    print(f"Wrote {len(args.tickers)} tickers x {args.bars} bars to {args.db_path}")
@@ -0,0 +1,56 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+import app as app_module
+
+N_FUTURE = 3
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module.model_cache, 'get', lambda table_name: None)
+    monkeypatch.setattr(app_module, 'forecast_window',
+                        lambda loaded, window: np.zeros((N_FUTURE, len(app_module.input_columns))))
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def bars_db(tmp_path, monkeypatch):
+    datetimes = pd.date_range('2024-01-30 09:15', periods=20, freq='5min').strftime('%Y-%m-%d %H:%M:%S')
+    bars = pd.DataFrame({'Datetime': datetimes, 'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5, 'Volume': 10.0})
+    paths = {'actual': str(tmp_path / 'bars.db'), 'predicted': str(tmp_path / 'predictions.db')}
+    for path in paths.values():
+        conn = sqlite3.connect(path)
+        if path == paths['actual']:
+            bars.to_sql('TCS_NS', conn, index=False)
+        conn.close()
+    monkeypatch.setattr(app_module, 'nifty50_db_path', paths['actual'])
+    monkeypatch.setattr(app_module, 'prediction_db_path', paths['predicted'])
+    return paths
+
+
+def test_forecast_keeps_wall_clock_of_tz_aware_last_datetime(client):
+    window = np.ones((app_module.n_steps, len(app_module.input_columns))).tolist()
+    response = client.post('/api/forecast/TCS_NS', json={'window': window, 'last_datetime': '2024-01-30T10:20:00+05:30'})
+    assert response.status_code == 200
+    assert [row['Datetime'] for row in response.get_json()['forecasts']] == [
+        '2024-01-30 10:25:00', '2024-01-30 10:30:00', '2024-01-30 10:35:00']
+
+
+def test_forecast_rejects_malformed_window(client):
+    response = client.post('/api/forecast/TCS_NS', json={'window': [[1, 2], [3]], 'last_datetime': '2024-01-30'})
+    assert response.status_code == 400
+
+
+def test_ohlc_accepts_tz_aware_and_naive_bounds(client, bars_db):
+    response = client.get('/api/ohlc?ticker=TCS_NS&from=2024-01-30T09:30:00%2B05:30&to=2024-01-30 09:40:00')
+    assert response.status_code == 200
+    assert response.get_json()['actual']['Datetime'] == [
+        '2024-01-30 09:30:00', '2024-01-30 09:35:00', '2024-01-30 09:40:00']
+
+
+@pytest.mark.parametrize('query', ['from=', 'to=', 'from=yesterday-ish'])
+def test_ohlc_rejects_empty_or_invalid_bounds(client, bars_db, query):
+    response = client.get(f'/api/ohlc?ticker=TCS_NS&{query}')
+    assert response.status_code == 400
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from windowing import to_float32_matrix, sliding_windows, make_sequences
+
+INPUT_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+OUTPUT_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+N_STEPS = 12
+N_FUTURE = 3
+
+
+def baseline_train_sequences(data, input_columns, output_columns, n_steps, n_future):
+    """The loop train_rnn.create_sequences used before windowing.py."""
+    X, y = [], []
+    for i in range(len(data) - n_steps - n_future + 1):
+        X.append(data[input_columns].iloc[i:i + n_steps].values)
+        y.append(data[output_columns].iloc[i + n_steps:i + n_steps + n_future].values)
+    return np.array(X), np.array(y)
+
+
+def baseline_predict_sequences(data, input_columns, n_steps):
+    """The loop predict_rnn.create_sequences used before windowing.py."""
+    X = []
+    for i in range(len(data) - n_steps):
+        X.append(data[input_columns].iloc[i:i+n_steps].values)
+    return np.array(X)
+
+
+def make_bars(n_rows, seed=0):
+    # float32 values, so the float64 baseline and the float32 views compare exactly
+    values = np.random.default_rng(seed).random((n_rows, len(INPUT_COLUMNS))).astype(np.float32)
+    return pd.DataFrame(values, columns=INPUT_COLUMNS)
+
+
+def assert_same_windows(actual, expected, window, n_features):
+    if len(expected) == 0:
+        assert actual.shape == (0, window, n_features)
+    else:
+        np.testing.assert_array_equal(actual, expected.astype(np.float32))
+
+
+@pytest.mark.parametrize('n_rows', [0, 5, N_STEPS, N_STEPS + N_FUTURE - 1, N_STEPS + N_FUTURE, 16, 500])
+def test_make_sequences_matches_training_loop(n_rows):
+    data = make_bars(n_rows)
+    expected_X, expected_y = baseline_train_sequences(data, INPUT_COLUMNS, OUTPUT_COLUMNS, N_STEPS, N_FUTURE)
+    X, y = make_sequences(to_float32_matrix(data, INPUT_COLUMNS), to_float32_matrix(data, OUTPUT_COLUMNS),
+                          N_STEPS, N_FUTURE)
+    assert len(X) == len(y) == len(expected_X)
+    assert_same_windows(X, expected_X, N_STEPS, len(INPUT_COLUMNS))
+    assert_same_windows(y, expected_y, N_FUTURE, len(OUTPUT_COLUMNS))
+
+
+@pytest.mark.parametrize('n_rows', [0, 5, N_STEPS, N_STEPS + 1, N_STEPS + N_FUTURE, 500])
+def test_sliding_windows_matches_prediction_loop(n_rows):
+    data = make_bars(n_rows)
+    expected = baseline_predict_sequences(data, INPUT_COLUMNS, N_STEPS)
+    X = sliding_windows(to_float32_matrix(data, INPUT_COLUMNS), N_STEPS, count=max(n_rows - N_STEPS, 0))
+    assert len(X) == len(expected)
+    assert_same_windows(X, expected, N_STEPS, len(INPUT_COLUMNS))
+
+
+@pytest.mark.parametrize('count, offset', [(None, 0), (None, 7), (10, 0), (10, 5), (0, 0), (1000, 3), (5, 499)])
+def test_sliding_windows_count_and_offset(count, offset):
+    values = to_float32_matrix(make_bars(100), INPUT_COLUMNS)
+    available = max(len(values) - offset - N_STEPS + 1, 0)
+    expected_count = available if count is None else min(count, available)
+    X = sliding_windows(values, N_STEPS, count=count, offset=offset)
+    assert X.shape == (expected_count, N_STEPS, len(INPUT_COLUMNS))
+    for i in range(expected_count):
+        np.testing.assert_array_equal(X[i], values[offset + i:offset + i + N_STEPS])
+
+
+def test_sliding_windows_are_read_only_views():
+    values = to_float32_matrix(make_bars(50), INPUT_COLUMNS)
+    X = sliding_windows(values, N_STEPS)
+    assert np.shares_memory(X, values)
+    assert not X.flags.writeable
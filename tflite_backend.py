@@ -0,0 +1,79 @@
+import os
+import numpy as np
+
+
+def tflite_path_for(model_path):
+    """Path of the TFLite export that sits next to a Keras .h5 model."""
+    return os.path.splitext(model_path)[0] + '.tflite'
+
+
+def is_current(tflite_path, model_path):
+    """
+    Return True if a TFLite export exists and is at least as new as the Keras
+    model it was converted from, so a retrained model is never shadowed by a
+    stale export.
+    """
+    return os.path.exists(tflite_path) and os.path.getmtime(tflite_path) >= os.path.getmtime(model_path)
+
+
+def load_interpreter(tflite_path, num_threads=None):
+    """
+    Load a TFLite model with the lightest interpreter available: the
+    standalone LiteRT or tflite_runtime packages when installed, which avoid
+    importing TensorFlow at all, otherwise tf.lite.
+    Args:
+        tflite_path (str): Path to the .tflite file.
+        num_threads (int): Interpreter threads; None leaves the interpreter's default.
+    Returns:
+        Interpreter: Interpreter for the model.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=tflite_path, num_threads=num_threads)
+
+
+class TFLitePredictor:
+    """
+    Run an exported model over batches of windows with the same call shape as
+    Keras model.predict.
+
+    Args:
+        tflite_path (str): Path to the .tflite file written by export_tflite.py.
+        batch_size (int): Maximum number of windows per interpreter call.
+        num_threads (int): Interpreter threads; None leaves the interpreter's default.
+    """
+
+    def __init__(self, tflite_path, batch_size=1024, num_threads=None):
+        self.interpreter = load_interpreter(tflite_path, num_threads)
+        self.batch_size = batch_size
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self._batch_shape = None
+
+    def _invoke(self, batch):
+        # Resizing reallocates every tensor, so only do it when the shape changes
+        if batch.shape != self._batch_shape:
+            self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_shape = batch.shape
+        self.interpreter.set_tensor(self.input_index, batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index).copy()
+
+    def predict(self, X):
+        """
+        Args:
+            X (np.ndarray): Scaled windows of shape (N, n_steps, F).
+        Returns:
+            np.ndarray: Scaled predictions of shape (N, n_future, F).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        outputs = [self._invoke(np.ascontiguousarray(X[start:start + self.batch_size]))
+                   for start in range(0, len(X), self.batch_size)]
+        return np.concatenate(outputs)
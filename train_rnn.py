@@ -3,12 +3,24 @@ import pandas as pd
 import numpy as np
 import os
 import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, GRU, Dense, Dropout
+from tensorflow.keras.models import Sequential, Model
+from tensorflow.keras.layers import LSTM, GRU, Dense, Dropout, Input, Embedding, RepeatVector, Concatenate, Reshape
 from sklearn.preprocessing import MinMaxScaler
 import joblib
 from tensorflow.keras.losses import MeanSquaredError
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
 import random
+import json
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from windowing import to_float32_matrix, make_sequences, sliding_windows, scale_rows
+from feature_store import FeatureStore, clean_bars
+from instrumentation import MetricsRecorder
+from performance import performance_config, configure_threads, scaling_dtype
+
+metrics = MetricsRecorder('train_rnn')
 
 def set_random_seed(seed=42):
     """
@@ -22,14 +34,9 @@ def set_random_seed(seed=42):
     np.random.seed(seed)
     tf.random.set_seed(seed)
     # Ensure TensorFlow uses deterministic behavior
-    tf.config.experimental.enable_op_determinism = True
-
-# Set the random seed
-set_random_seed(42)
-
-# Ensure models directory exists
-os.makedirs('models', exist_ok=True)
+    tf.config.experimental.enable_op_determinism()
 
+@metrics.timed('preprocess_data', rows=lambda data: sum(len(df) for df in data.values()))
 def preprocess_data(database_path):
     conn = sqlite3.connect(database_path)
     tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table';", conn)['name'].tolist()
@@ -37,19 +44,42 @@ def preprocess_data(database_path):
     data = {}
     for table in tables:
         df = pd.read_sql(f"SELECT * FROM {table};", conn)
-        df['Datetime'] = pd.to_datetime(df['Datetime'], errors='coerce')
-        df.dropna(subset=['Datetime'], inplace=True)
-        df.drop_duplicates(subset=['Datetime'], inplace=True)
-        df.sort_values('Datetime', inplace=True)
-        data[table] = df
+        data[table] = clean_bars(df)
     conn.close()
     return data
 
-def scale_data(df, input_columns):
+def ticker_bars(table_name, input_columns, df=None, store=None):
+    """
+    Datetimes and feature matrix of a ticker's cleaned bars.
+
+    Args:
+        table_name (str): Name of the ticker table.
+        input_columns (list): Feature columns, in model order.
+        df (pd.DataFrame): Cleaned bars, used when there is no store.
+        store (FeatureStore): Synced feature store. Its columns are the
+            models' input columns, and its read-only memory maps are returned
+            as they are, so bars are only read once a slice of them is used.
+
+    Returns:
+        tuple: Sorted datetime64[ns] array of shape (N,) and values of shape (N, F).
+    """
+    if store is not None:
+        return store.datetimes(table_name), store.values(table_name)
+    return df['Datetime'].to_numpy(dtype='datetime64[ns]'), df[input_columns].to_numpy()
+
+def bars_through(datetimes, timestamp):
+    """Number of bars at or before timestamp in a sorted datetime64[ns] array."""
+    return int(np.searchsorted(datetimes, np.datetime64(pd.Timestamp(timestamp), 'ns'), side='right'))
+
+def scale_data(df, input_columns, dtype=np.float64):
     scaler = MinMaxScaler()
-    df[input_columns] = scaler.fit_transform(df[input_columns])
+    df[input_columns] = scaler.fit_transform(df[input_columns].astype(dtype))
     return df, scaler
 
+def fit_scaler(values, input_columns, dtype=np.float64):
+    """Fit a MinMaxScaler on a feature matrix, keeping the column names so it also transforms DataFrames."""
+    return MinMaxScaler().fit(pd.DataFrame(np.asarray(values, dtype=dtype), columns=input_columns))
+
 def split_data(df, train_ratio=0.8):
     n_train = int(len(df) * train_ratio)
     train_data = df[:n_train]
@@ -68,59 +98,722 @@ def create_sequences(data, input_columns, output_columns, n_steps, n_future):
         n_future (int): Number of timesteps to predict.
 
     Returns:
-        tuple: Input (X) and target (y) sequences.
+        tuple: Input (X) and target (y) sequences as float32 strided views.
+    """
+    inputs = to_float32_matrix(data, input_columns)
+    outputs = inputs if output_columns == input_columns else to_float32_matrix(data, output_columns)
+    return make_sequences(inputs, outputs, n_steps, n_future)
+
+def make_window_dataset(inputs, outputs, n_steps, n_future, batch_size=32, shuffle=True, seed=42):
+    """
+    Build a tf.data pipeline that cuts training windows out of the base arrays on the fly.
+    Only window start indices are shuffled and batched; each batch is gathered from the
+    base arrays, so the overlapping windows are never materialized together.
+
+    Args:
+        inputs (np.ndarray): Scaled input feature matrix of shape (N, F_in).
+        outputs (np.ndarray): Scaled target feature matrix of shape (N, F_out).
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+        batch_size (int): Number of windows per batch.
+        shuffle (bool): Reshuffle window order every epoch.
+        seed (int): Seed for the shuffle order.
+
+    Returns:
+        tf.data.Dataset: Batches of (X, y) with shapes (B, n_steps, F_in) and (B, n_future, F_out).
     """
-    X, y = [], []
-    for i in range(len(data) - n_steps - n_future + 1):
-        X.append(data[input_columns].iloc[i:i + n_steps].values)
-        y.append(data[output_columns].iloc[i + n_steps:i + n_steps + n_future].values)
-    return np.array(X), np.array(y)
+    count = max(len(inputs) - n_steps - n_future + 1, 0)
+    base_inputs = tf.constant(inputs, dtype=tf.float32)
+    base_outputs = base_inputs if outputs is inputs else tf.constant(outputs, dtype=tf.float32)
+    input_offsets = tf.range(n_steps, dtype=tf.int64)
+    output_offsets = tf.range(n_steps, n_steps + n_future, dtype=tf.int64)
 
-def train_rnn_model(X_train, y_train):
+    def gather_windows(starts):
+        X = tf.gather(base_inputs, starts[:, None] + input_offsets[None, :])
+        y = tf.gather(base_outputs, starts[:, None] + output_offsets[None, :])
+        return X, y
+
+    dataset = tf.data.Dataset.range(count)
+    if shuffle:
+        dataset = dataset.shuffle(max(count, 1), seed=seed, reshuffle_each_iteration=True)
+    return (dataset
+            .batch(batch_size)
+            .map(gather_windows, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
+
+def rnn_settings(performance=None):
+    """
+    Layer, compile and batch settings for a performance config (see
+    performance.py); None keeps the standard settings.
+
+    Args:
+        performance (dict): Settings from performance_config, or None.
+
+    Returns:
+        dict: unroll and jit_compile for the model, batch_size for the datasets.
+    """
+    if performance is None:
+        return {'unroll': False, 'jit_compile': 'auto', 'batch_size': 32}
+    return {'unroll': performance['unroll'], 'jit_compile': performance['jit_compile'],
+            'batch_size': performance['train_batch_size']}
+
+def training_callbacks(patience=5):
+    """
+    Stop once validation loss stops improving, keeping the best epoch's weights,
+    and halve the learning rate when it plateaus for half as long.
+
+    Args:
+        patience (int): Epochs without val_loss improvement before stopping.
+
+    Returns:
+        list: Keras callbacks for fit.
+    """
+    return [
+        EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True),
+        ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=max(1, patience // 2), min_lr=1e-5),
+    ]
+
+def train_rnn_model(train_dataset, verbose=1, epochs=50, validation_dataset=None, patience=5, performance=None):
     """
     Train the RNN model.
 
     Args:
-        X_train (np.ndarray): Training input data.
-        y_train (np.ndarray): Training target data.
+        train_dataset (tf.data.Dataset): Batches of (X, y) training windows,
+            e.g. from make_window_dataset.
+        verbose (int): Keras verbosity level passed to fit.
+        epochs (int): Maximum number of training epochs.
+        validation_dataset (tf.data.Dataset): Held-out windows. When given,
+            training stops early on a val_loss plateau (see training_callbacks).
+        patience (int): Early-stopping patience in epochs.
+        performance (dict): Performance-mode settings (see rnn_settings), or None.
 
     Returns:
         Model: Trained RNN model.
     """
+    settings = rnn_settings(performance)
+    unroll = settings['unroll']
+    input_spec, output_spec = train_dataset.element_spec
+    n_steps, n_features = input_spec.shape[1], input_spec.shape[2]
+    n_future, n_outputs = output_spec.shape[1], output_spec.shape[2]
     model = Sequential([
-        LSTM(128, activation='relu', return_sequences=True, input_shape=(X_train.shape[1], X_train.shape[2])),
+        LSTM(128, activation='relu', return_sequences=True, unroll=unroll, input_shape=(n_steps, n_features)),
         Dropout(0.2),
-        GRU(64, activation='relu', return_sequences=True),
+        GRU(64, activation='relu', return_sequences=True, unroll=unroll),
         Dropout(0.2),
-        GRU(32, activation='relu'),
-        Dense(y_train.shape[1] * y_train.shape[2]),  # Output for all timesteps and features
-        tf.keras.layers.Reshape((y_train.shape[1], y_train.shape[2]))  # Reshape to (n_future, output_columns)
+        GRU(32, activation='relu', unroll=unroll),
+        Dense(n_future * n_outputs),  # Output for all timesteps and features
+        tf.keras.layers.Reshape((n_future, n_outputs))  # Reshape to (n_future, output_columns)
     ])
-    model.compile(optimizer='adam', loss=MeanSquaredError())
-    model.fit(X_train, y_train, epochs=50, batch_size=32, verbose=1)
+    model.compile(optimizer='adam', loss=MeanSquaredError(), jit_compile=settings['jit_compile'])
+    callbacks = None if validation_dataset is None else training_callbacks(patience)
+    model.fit(train_dataset, epochs=epochs, verbose=verbose, validation_data=validation_dataset, callbacks=callbacks)
     return model
 
-def main():
-    database_path = 'nifty50_data_v1.db'
-    data = preprocess_data(database_path)
+def inverse_scale(values, scaler):
+    """Undo MinMax scaling on an array of windows of shape (N, T, F)."""
+    values = np.asarray(values)
+    return scaler.inverse_transform(values.reshape(-1, values.shape[-1])).reshape(values.shape)
+
+def horizon_errors(predictions, targets, columns):
+    """
+    Per-horizon-step error of a batch of forecasts, computed in one pass.
+
+    Args:
+        predictions (np.ndarray): Forecasts of shape (N, n_future, F).
+        targets (np.ndarray): Actual values of the same shape.
+        columns (list): Names of the F features.
+
+    Returns:
+        list: One dict per horizon step with its MAE and RMSE per feature.
+    """
+    errors = np.asarray(predictions, dtype=np.float64) - np.asarray(targets, dtype=np.float64)
+    mae = np.abs(errors).mean(axis=0)
+    rmse = np.sqrt((errors ** 2).mean(axis=0))
+    return [{'step': step + 1,
+             'mae': dict(zip(columns, mae[step].tolist())),
+             'rmse': dict(zip(columns, rmse[step].tolist()))}
+            for step in range(errors.shape[1])]
+
+def evaluate_model(model, inputs, outputs, scaler, n_steps, n_future, output_columns):
+    """
+    Forecast every held-out window in batches and measure the error in the
+    original (unscaled) units.
+
+    Args:
+        model (Model): Trained model.
+        inputs (np.ndarray): Scaled input rows; the first n_steps only provide context.
+        outputs (np.ndarray): Scaled target rows aligned with inputs.
+        scaler (MinMaxScaler): Scaler used for the targets.
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+        output_columns (list): Names of the target features.
+
+    Returns:
+        dict: Number of test windows and per-horizon-step MAE/RMSE.
+    """
+    X, y = make_sequences(inputs, outputs, n_steps, n_future)
+    if len(X) == 0:
+        return {'test_windows': 0, 'horizons': []}
+    predictions = model.predict(X, batch_size=1024, verbose=0)
+    return {'test_windows': len(X),
+            'horizons': horizon_errors(inverse_scale(predictions, scaler), inverse_scale(y, scaler), output_columns)}
+
+def make_multi_ticker_dataset(inputs, ticker_ids, starts, n_steps, n_future, batch_size=32, shuffle=True, seed=42):
+    """
+    Build a tf.data pipeline of windows drawn from several tickers stacked into one matrix.
+    Like make_window_dataset, but window starts are given explicitly so no window
+    crosses from one ticker's rows into the next, and each window carries the id
+    of the ticker it belongs to.
+
+    Args:
+        inputs (np.ndarray): Scaled feature rows of every ticker, stacked, of shape (N, F).
+        ticker_ids (np.ndarray): Ticker id of each row, shape (N,).
+        starts (np.ndarray): Row index of the first bar of every training window.
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+        batch_size (int): Number of windows per batch.
+        shuffle (bool): Reshuffle window order every epoch.
+        seed (int): Seed for the shuffle order.
+
+    Returns:
+        tf.data.Dataset: Batches of ({'window': X, 'ticker': ids}, y).
+    """
+    base_inputs = tf.constant(inputs, dtype=tf.float32)
+    base_ids = tf.constant(ticker_ids, dtype=tf.int32)
+    input_offsets = tf.range(n_steps, dtype=tf.int64)
+    output_offsets = tf.range(n_steps, n_steps + n_future, dtype=tf.int64)
+
+    def gather_windows(batch_starts):
+        X = tf.gather(base_inputs, batch_starts[:, None] + input_offsets[None, :])
+        y = tf.gather(base_inputs, batch_starts[:, None] + output_offsets[None, :])
+        return {'window': X, 'ticker': tf.gather(base_ids, batch_starts)}, y
+
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(starts, dtype=np.int64))
+    if shuffle:
+        dataset = dataset.shuffle(max(len(starts), 1), seed=seed, reshuffle_each_iteration=True)
+    return (dataset
+            .batch(batch_size)
+            .map(gather_windows, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
+
+def build_multi_ticker_model(n_tickers, n_steps, n_features, n_future, embedding_dim=8, performance=None):
+    """
+    Build the shared RNN: the per-ticker architecture with a learned ticker
+    embedding appended to every timestep of the input window.
+
+    Args:
+        n_tickers (int): Number of tickers the embedding covers.
+        n_steps (int): Number of timesteps in the input sequence.
+        n_features (int): Number of features per timestep.
+        n_future (int): Number of timesteps to predict.
+        embedding_dim (int): Size of the ticker embedding.
+        performance (dict): Performance-mode settings (see rnn_settings), or None.
+
+    Returns:
+        Model: Compiled model taking {'window', 'ticker'} inputs.
+    """
+    settings = rnn_settings(performance)
+    unroll = settings['unroll']
+    window = Input(shape=(n_steps, n_features), name='window')
+    ticker = Input(shape=(), dtype='int32', name='ticker')
+    embedded = RepeatVector(n_steps)(Embedding(n_tickers, embedding_dim)(ticker))
+    x = Concatenate()([window, embedded])
+    x = LSTM(128, activation='relu', return_sequences=True, unroll=unroll)(x)
+    x = Dropout(0.2)(x)
+    x = GRU(64, activation='relu', return_sequences=True, unroll=unroll)(x)
+    x = Dropout(0.2)(x)
+    x = GRU(32, activation='relu', unroll=unroll)(x)
+    x = Dense(n_future * n_features)(x)
+    model = Model(inputs={'window': window, 'ticker': ticker}, outputs=Reshape((n_future, n_features))(x))
+    model.compile(optimizer='adam', loss=MeanSquaredError(), jit_compile=settings['jit_compile'])
+    return model
+
+def save_atomically(save, path):
+    """
+    Write a file through a temporary file in the same directory and move it into place,
+    so readers never see a partially written model or scaler.
+
+    Args:
+        save (callable): Function that writes to the path it is given.
+        path (str): Final destination path.
+    """
+    directory, filename = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=f'.{filename}.', suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+    try:
+        save(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def load_watermark(path):
+    """
+    Load the training watermark stored next to a model.
+
+    Args:
+        path (str): Path of the watermark JSON file.
+
+    Returns:
+        pd.Timestamp or None: Last bar Datetime the model was trained on, or None if absent.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        watermark = pd.Timestamp(json.load(f)['last_datetime'])
+    # Bars are cleaned to local wall time without a UTC offset; older watermarks kept it
+    return watermark.tz_localize(None) if watermark.tz is not None else watermark
+
+def save_watermark(path, last_datetime):
+    """
+    Store the training watermark next to a model.
+
+    Args:
+        path (str): Path of the watermark JSON file.
+        last_datetime (pd.Timestamp): Last bar Datetime the model was trained on.
+    """
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump({'last_datetime': pd.Timestamp(last_datetime).isoformat()}, f)
+
+    save_atomically(write, path)
+
+def save_json(path, data):
+    """
+    Write a JSON file atomically.
+
+    Args:
+        path (str): Destination path.
+        data: JSON-serializable object.
+    """
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    save_atomically(write, path)
+
+def full_retrain_reason(datetimes, values, model_path, scaler_path, watermark):
+    """
+    Decide whether an existing model can be fine-tuned or needs a full retrain.
+
+    Args:
+        datetimes (np.ndarray): Sorted bar Datetimes of the ticker.
+        values (np.ndarray): Unscaled feature matrix of the ticker.
+        model_path (str): Path of the saved model.
+        scaler_path (str): Path of the saved scaler.
+        watermark (pd.Timestamp): Training watermark, or None if absent.
+
+    Returns:
+        str or None: Why a full retrain is required, or None if fine-tuning is possible.
+    """
+    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        return 'no previous model'
+    if watermark is None:
+        return 'no training watermark'
+    scaler = joblib.load(scaler_path)
+    new_values = np.asarray(values[bars_through(datetimes, watermark):])
+    if (new_values < scaler.data_min_).any() or (new_values > scaler.data_max_).any():
+        return 'data outside scaler range'
+    return None
+
+def finetune_ticker(datetimes, values, model_path, scaler, watermark, input_columns, output_columns,
+                    n_steps, n_future, seed, epochs, verbose, performance=None):
+    """
+    Fine-tune an existing model on the bars added since its training watermark.
+    Only the bars the new windows cover are read and scaled.
 
-    for table_name, df in data.items():
-        input_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-        output_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-        n_steps = 12
-        n_future = 3
+    Args:
+        datetimes (np.ndarray): Sorted bar Datetimes of the ticker.
+        values (np.ndarray): Unscaled feature matrix of the ticker, in input_columns order.
+        model_path (str): Path of the saved model.
+        scaler (MinMaxScaler): Scaler the model was trained with.
+        watermark (pd.Timestamp): Last bar Datetime the model was trained on.
+        input_columns (list): Columns to be used as input features.
+        output_columns (list): Columns to be used as output features.
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+        seed (int): Seed for the shuffle order.
+        epochs (int): Number of fine-tuning epochs.
+        verbose (int): Keras verbosity level passed to fit.
+        performance (dict): Performance-mode settings (see rnn_settings), or None.
 
-        df, scaler = scale_data(df, input_columns)
-        train_data, test_data = split_data(df)
+    Returns:
+        tuple: Fine-tuned model (None if there were no new windows) and the number of windows trained on.
+    """
+    first_new = bars_through(datetimes, watermark)
+    # Every window whose targets include at least one new bar
+    start = max(first_new - n_steps - n_future + 1, 0)
+    train_windows = max(len(values) - start - n_steps - n_future + 1, 0)
+    if first_new >= len(values) or train_windows == 0:
+        return None, 0
 
-        X_train, y_train = create_sequences(train_data, input_columns, output_columns, n_steps, n_future)
+    settings = rnn_settings(performance)
+    inputs = scale_rows(values[start:], scaler, scaling_dtype(performance))
+    outputs = output_matrix(inputs, input_columns, output_columns)
 
-        model = train_rnn_model(X_train, y_train)
+    model = tf.keras.models.load_model(model_path, compile=False)
+    model.compile(optimizer='adam', loss=MeanSquaredError(), jit_compile=settings['jit_compile'])
+    model.fit(make_window_dataset(inputs, outputs, n_steps, n_future, batch_size=settings['batch_size'], seed=seed),
+              epochs=epochs, verbose=verbose)
+    return model, train_windows
 
-        model_path = os.path.join('models', f'{table_name}_model.h5')
-        scaler_path = os.path.join('models', f'{table_name}_scaler.pkl')
+def output_matrix(inputs, input_columns, output_columns):
+    """Target columns of a scaled input matrix, without a copy when they are the inputs."""
+    if output_columns == input_columns:
+        return inputs
+    return np.ascontiguousarray(inputs[:, [input_columns.index(c) for c in output_columns]])
 
-        model.save(model_path)
-        joblib.dump(scaler, scaler_path)
+def train_ticker(table_name, df=None, n_steps=12, n_future=3, seed=42, verbose=1, full_retrain=True, finetune_epochs=3,
+                 max_epochs=50, patience=5, val_ratio=0.1, performance=None, store_dir=None):
+    """
+    Train, and save the model and scaler for, a single ticker table.
+    The random seed is reset first so results do not depend on which worker
+    trains the ticker or in what order.
+
+    Unless full_retrain is set, an existing model is fine-tuned on the bars added
+    since its training watermark. A full retrain still happens when there is no
+    previous model or when new bars fall outside the scaler's fitted range.
+
+    A full retrain holds out the newest 20% of bars for testing and the
+    val_ratio share of the rest before them for validation, stops once
+    validation loss stops improving, and saves per-horizon-step test MAE/RMSE
+    to models/<table>_evaluation.json. Its watermark is the last bar the model
+    was fit on, not the last bar of the data, so the next run fine-tunes on
+    the held-out validation and test bars along with any new ones.
+
+    Args:
+        table_name (str): Name of the ticker table.
+        df (pd.DataFrame): Preprocessed data for the ticker, when not reading a feature store.
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+        seed (int): Seed value for randomness.
+        verbose (int): Keras verbosity level passed to fit.
+        full_retrain (bool): Train from random weights and refit the scaler.
+        finetune_epochs (int): Number of epochs when fine-tuning an existing model.
+        max_epochs (int): Upper bound on epochs for a full retrain.
+        patience (int): Early-stopping patience in epochs.
+        val_ratio (float): Share of the training bars held out for validation.
+        performance (dict): Performance-mode settings (see performance.py), or None.
+        store_dir (str): Read the bars from the memory maps of this synced
+            feature store instead of df.
+
+    Returns:
+        dict: Per-ticker training summary.
+    """
+    set_random_seed(seed)
+    start = time.perf_counter()
+    input_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    output_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+    model_path = os.path.join('models', f'{table_name}_model.h5')
+    scaler_path = os.path.join('models', f'{table_name}_scaler.pkl')
+    watermark_path = os.path.join('models', f'{table_name}_watermark.json')
+    evaluation_path = os.path.join('models', f'{table_name}_evaluation.json')
+    store = None if store_dir is None else FeatureStore(store_dir)
+    datetimes, values = ticker_bars(table_name, input_columns, df, store)
+    last_datetime = pd.Timestamp(datetimes[-1])
+
+    summary = {'table': table_name, 'status': 'ok', 'rows': len(values), 'model_path': model_path}
+    watermark = load_watermark(watermark_path)
+    reason = 'requested' if full_retrain else full_retrain_reason(datetimes, values, model_path, scaler_path, watermark)
+    if reason is None:
+        with metrics.stage('finetune', ticker=table_name) as m:
+            model, train_windows = finetune_ticker(datetimes, values, model_path, joblib.load(scaler_path), watermark,
+                                                   input_columns, output_columns, n_steps, n_future,
+                                                   seed, finetune_epochs, verbose, performance)
+            m['rows'] = train_windows
+        if model is None:
+            summary.update(mode='up_to_date', train_windows=0)
+        else:
+            with metrics.stage('save', ticker=table_name):
+                save_atomically(model.save, model_path)
+                save_watermark(watermark_path, last_datetime)
+            summary.update(mode='finetune', train_windows=train_windows,
+                           final_loss=float(model.history.history['loss'][-1]))
+        summary['seconds'] = round(time.perf_counter() - start, 2)
+        metrics.flush()
+        return summary
+
+    with metrics.stage('scale', ticker=table_name, rows=len(values)):
+        # Scaled into a new matrix, so callers sharing the frame (pipeline.py) still see raw bars
+        dtype = scaling_dtype(performance)
+        scaler = fit_scaler(values, input_columns, dtype)
+        inputs = scale_rows(values, scaler, dtype)
+        outputs = output_matrix(inputs, input_columns, output_columns)
+        batch_size = rnn_settings(performance)['batch_size']
+        # Time-ordered: fit on the oldest bars, validate on the next, test on the newest (as split_data)
+        n_train = int(len(values) * 0.8)
+        n_fit = int(n_train * (1 - val_ratio))
+        train_dataset = make_window_dataset(inputs[:n_fit], outputs[:n_fit], n_steps, n_future,
+                                            batch_size=batch_size, seed=seed)
+        train_windows = max(n_fit - n_steps - n_future + 1, 0)
+        # Held-out windows take context from the bars before them but targets only from held-out bars
+        val_start = max(n_fit - n_steps, 0)
+        val_windows = max(n_train - val_start - n_steps - n_future + 1, 0)
+        val_dataset = None if val_windows == 0 else make_window_dataset(
+            inputs[val_start:n_train], outputs[val_start:n_train], n_steps, n_future, batch_size=batch_size, shuffle=False)
+
+    with metrics.stage('train', ticker=table_name, rows=train_windows):
+        model = train_rnn_model(train_dataset, verbose=verbose, epochs=max_epochs,
+                                validation_dataset=val_dataset, patience=patience, performance=performance)
+
+    with metrics.stage('evaluate', ticker=table_name) as m:
+        test_start = max(n_train - n_steps, 0)
+        evaluation = evaluate_model(model, inputs[test_start:], outputs[test_start:], scaler,
+                                    n_steps, n_future, output_columns)
+        m['rows'] = evaluation['test_windows']
+        history = model.history.history
+        # Bars after the fit split were only used to validate and test
+        trained_through = pd.Timestamp(datetimes[max(n_fit, 1) - 1])
+        evaluation.update(table=table_name, trained_at=pd.Timestamp(last_datetime).isoformat(),
+                          trained_through=trained_through.isoformat(),
+                          epochs=len(history['loss']), train_windows=train_windows, val_windows=val_windows,
+                          best_val_loss=min(history['val_loss']) if 'val_loss' in history else None)
+
+    with metrics.stage('save', ticker=table_name):
+        save_atomically(model.save, model_path)
+        save_atomically(lambda path: joblib.dump(scaler, path), scaler_path)
+        save_json(evaluation_path, evaluation)
+        save_watermark(watermark_path, trained_through)
+    metrics.flush()
+
+    summary.update(mode='full', reason=reason, train_windows=train_windows, epochs=evaluation['epochs'],
+                   final_loss=float(history['loss'][-1]), best_val_loss=evaluation['best_val_loss'],
+                   test_windows=evaluation['test_windows'], evaluation_path=evaluation_path,
+                   seconds=round(time.perf_counter() - start, 2))
+    return summary
+
+def train_multi_ticker(data, n_steps=12, n_future=3, seed=42, verbose=1, epochs=50, embedding_dim=8,
+                       patience=5, val_ratio=0.1, performance=None, store_dir=None):
+    """
+    Train one shared model over every ticker, conditioned on a ticker embedding.
+    Each ticker keeps its own scaler; the model, and the ticker order and
+    scalers it was trained with, are saved as models/multi_ticker_model.h5 and
+    models/multi_ticker_meta.pkl. The shared model is always trained from scratch.
+
+    Every ticker's bars are split in time as in train_ticker; validation windows
+    from all tickers drive early stopping, and per-ticker, per-horizon-step test
+    MAE/RMSE are saved to models/multi_ticker_evaluation.json.
+
+    Args:
+        data (dict): Preprocessed data per ticker table; with store_dir only its keys are used.
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+        seed (int): Seed value for randomness.
+        verbose (int): Keras verbosity level passed to fit.
+        epochs (int): Maximum number of training epochs.
+        embedding_dim (int): Size of the ticker embedding.
+        patience (int): Early-stopping patience in epochs.
+        val_ratio (float): Share of each ticker's training bars held out for validation.
+        performance (dict): Performance-mode settings (see performance.py), or None.
+        store_dir (str): Read the bars from the memory maps of this synced feature store.
+
+    Returns:
+        dict: Training summary.
+    """
+    set_random_seed(seed)
+    start = time.perf_counter()
+    input_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    model_path = os.path.join('models', 'multi_ticker_model.h5')
+    meta_path = os.path.join('models', 'multi_ticker_meta.pkl')
+    evaluation_path = os.path.join('models', 'multi_ticker_evaluation.json')
+
+    tickers = sorted(data)
+    store = None if store_dir is None else FeatureStore(store_dir)
+    bars = {table_name: ticker_bars(table_name, input_columns, data[table_name], store) for table_name in tickers}
+    scalers, blocks, ids = {}, [], []
+    fit_starts, val_starts, test_starts = [], [], {}
+    offset = 0
+    batch_size = rnn_settings(performance)['batch_size']
+    dtype = scaling_dtype(performance)
+    with metrics.stage('scale', rows=sum(len(values) for _, values in bars.values())):
+        for ticker_id, table_name in enumerate(tickers):
+            values = bars[table_name][1]
+            scalers[table_name] = fit_scaler(values, input_columns, dtype)
+            # Time-ordered splits, as in train_ticker
+            n_rows = len(values)
+            n_train = int(n_rows * 0.8)
+            n_fit = int(n_train * (1 - val_ratio))
+            # Window starts per split; held-out windows take context from the bars before them
+            fit_starts.append(offset + np.arange(0, n_fit - n_steps - n_future + 1))
+            val_starts.append(offset + np.arange(max(n_fit - n_steps, 0), n_train - n_steps - n_future + 1))
+            test_starts[table_name] = offset + np.arange(max(n_train - n_steps, 0), n_rows - n_steps - n_future + 1)
+            blocks.append(scale_rows(values, scalers[table_name], dtype))
+            ids.append(np.full(n_rows, ticker_id, dtype=np.int32))
+            offset += n_rows
+        values, ids = np.concatenate(blocks), np.concatenate(ids)
+        fit_starts, val_starts = np.concatenate(fit_starts), np.concatenate(val_starts)
+        train_dataset = make_multi_ticker_dataset(values, ids, fit_starts, n_steps, n_future,
+                                                  batch_size=batch_size, seed=seed)
+        val_dataset = None if len(val_starts) == 0 else make_multi_ticker_dataset(
+            values, ids, val_starts, n_steps, n_future, batch_size=batch_size, shuffle=False)
+
+    with metrics.stage('train', rows=len(fit_starts)):
+        model = build_multi_ticker_model(len(tickers), n_steps, len(input_columns), n_future, embedding_dim,
+                                         performance=performance)
+        callbacks = None if val_dataset is None else training_callbacks(patience)
+        model.fit(train_dataset, epochs=epochs, verbose=verbose, validation_data=val_dataset, callbacks=callbacks)
+        history = model.history.history
+
+    with metrics.stage('evaluate') as m:
+        windows = sliding_windows(values, n_steps)
+        targets = sliding_windows(values, n_future, offset=n_steps)
+        all_test = np.concatenate(list(test_starts.values()))
+        predictions = model.predict({'window': windows[all_test], 'ticker': ids[all_test]}, batch_size=1024, verbose=0)
+        m['rows'] = len(all_test)
+        evaluation = {'trained_at': max(pd.Timestamp(datetimes[-1]) for datetimes, _ in bars.values()).isoformat(),
+                      'epochs': len(history['loss']),
+                      'best_val_loss': min(history['val_loss']) if 'val_loss' in history else None,
+                      'tickers': {}}
+        position = 0
+        for table_name, starts in test_starts.items():
+            ticker_predictions = predictions[position:position + len(starts)]
+            position += len(starts)
+            horizons = []
+            if len(starts):
+                horizons = horizon_errors(inverse_scale(ticker_predictions, scalers[table_name]),
+                                          inverse_scale(targets[starts], scalers[table_name]), input_columns)
+            evaluation['tickers'][table_name] = {'test_windows': len(starts), 'horizons': horizons}
+
+    with metrics.stage('save'):
+        save_atomically(model.save, model_path)
+        meta = {'tickers': tickers, 'scalers': scalers, 'input_columns': input_columns,
+                'n_steps': n_steps, 'n_future': n_future}
+        save_atomically(lambda path: joblib.dump(meta, path), meta_path)
+        save_json(evaluation_path, evaluation)
+    metrics.flush()
+
+    return {'table': 'multi_ticker', 'status': 'ok', 'mode': 'full', 'tickers': tickers,
+            'rows': sum(len(values) for _, values in bars.values()), 'model_path': model_path,
+            'train_windows': len(fit_starts), 'epochs': evaluation['epochs'],
+            'final_loss': float(history['loss'][-1]), 'best_val_loss': evaluation['best_val_loss'],
+            'evaluation_path': evaluation_path, 'seconds': round(time.perf_counter() - start, 2)}
+
+def init_worker(threads):
+    """
+    Cap TensorFlow thread pools in a training worker so parallel workers
+    do not oversubscribe the CPU. Must run before any TensorFlow op executes.
+
+    Args:
+        threads (int): Intra-op thread budget for this worker.
+    """
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(min(2, threads))
+
+def main(workers=1, threads_per_worker=None, full_retrain=False, finetune_epochs=3, store_dir=None,
+         multi_ticker=False, max_epochs=50, patience=5, data=None, performance=None,
+         database_path='nifty50_data_v1.db', tickers=None, n_steps=12, n_future=3):
+    """
+    Train one model per ticker table.
+
+    Args:
+        workers (int): Number of worker processes. 1 trains in this process, one ticker after another.
+        threads_per_worker (int): TensorFlow thread budget per worker. Defaults to an even share of the CPUs.
+        full_retrain (bool): Retrain every ticker from scratch instead of fine-tuning existing models.
+        finetune_epochs (int): Number of epochs when fine-tuning an existing model.
+        store_dir (str): Read cleaned bars from the memory maps of this feature store (see feature_store.py)
+            instead of SQLite. Ignored when data is given.
+        multi_ticker (bool): Train one shared model over all tickers instead of one model per ticker.
+        max_epochs (int): Upper bound on epochs for a full retrain; early stopping usually ends it sooner.
+        patience (int): Epochs without validation improvement before training stops.
+        data (dict): Already cleaned bars per ticker table (see pipeline.py); read from the database if None.
+        performance (bool): Use the performance mode configured in performance.py. Defaults to $RNN_PERFORMANCE_MODE.
+        database_path (str): Source database of ticker tables.
+        tickers (list): Only train these ticker tables. Defaults to every table.
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+    """
+    os.makedirs('models', exist_ok=True)
+    config = performance_config(performance)
+    if workers <= 1:
+        configure_threads(tf, config)
+    # Only read the feature store when no bars were handed in
+    store_dir = store_dir if data is None else None
+    if store_dir is not None:
+        with metrics.stage('sync_feature_store') as m:
+            synced = FeatureStore(store_dir).sync(database_path)
+            m['rows'] = sum(written for _, written in synced.values())
+        # Each ticker's bars are read from the store's memory maps as they are trained
+        data = {table: None for table in synced}
+    elif data is None:
+        data = preprocess_data(database_path)
+    if tickers is not None:
+        data = {table: df for table, df in data.items() if table in tickers}
+    results = []
+    # Spawned workers inherit this, so their metrics share the run id
+    os.environ['PIPELINE_RUN_ID'] = metrics.run_id
+
+    options = dict(n_steps=n_steps, n_future=n_future, full_retrain=full_retrain, finetune_epochs=finetune_epochs,
+                   max_epochs=max_epochs, patience=patience, performance=config, store_dir=store_dir)
+
+    if multi_ticker:
+        results.append(train_multi_ticker(data, n_steps=n_steps, n_future=n_future, epochs=max_epochs,
+                                          patience=patience, performance=config, store_dir=store_dir))
+    elif workers <= 1:
+        for table_name, df in data.items():
+            try:
+                results.append(train_ticker(table_name, df, **options))
+            except Exception as e:
+                results.append({'table': table_name, 'status': 'failed', 'error': repr(e)})
+    else:
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        # TensorFlow is not fork-safe, so workers start from a fresh interpreter
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=init_worker, initargs=(threads,)) as executor:
+            futures = {executor.submit(train_ticker, table_name, df, verbose=2, **options): table_name
+                       for table_name, df in data.items()}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({'table': futures[future], 'status': 'failed', 'error': repr(e)})
+
+    results.sort(key=lambda r: r['table'])
+    for r in results:
+        if r['status'] != 'ok':
+            print(f"{r['table']}: FAILED {r['error']}")
+        elif r['mode'] == 'up_to_date':
+            print(f"{r['table']}: up to date")
+        else:
+            epochs = f" epochs={r['epochs']}" if 'epochs' in r else ''
+            print(f"{r['table']}: {r['mode']} loss={r['final_loss']:.6f} windows={r['train_windows']}{epochs} time={r['seconds']}s")
+    def write_summary(path):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    save_atomically(write_summary, os.path.join('models', 'training_summary.json'))
+    metrics.flush()
+
+    failed = [r['table'] for r in results if r['status'] != 'ok']
+    if failed:
+        raise RuntimeError(f"Training failed for: {', '.join(failed)}")
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train one RNN model per ticker table.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of tickers to train in parallel worker processes.")
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help="TensorFlow thread budget per worker (default: CPUs divided by workers).")
+    parser.add_argument('--full-retrain', action='store_true',
+                        help="Retrain every ticker from scratch instead of fine-tuning existing models.")
+    parser.add_argument('--finetune-epochs', type=int, default=3,
+                        help="Number of epochs when fine-tuning an existing model on new bars.")
+    parser.add_argument('--feature-store', metavar='DIR', default=None,
+                        help="Read cleaned bars from a memory-mapped feature store in DIR (see feature_store.py).")
+    parser.add_argument('--multi-ticker', action='store_true',
+                        help="Train one shared model with a ticker embedding instead of one model per ticker.")
+    parser.add_argument('--max-epochs', type=int, default=50,
+                        help="Upper bound on epochs for a full retrain; early stopping usually ends it sooner.")
+    parser.add_argument('--patience', type=int, default=5,
+                        help="Epochs without validation-loss improvement before training stops.")
+    parser.add_argument('--performance', action='store_true', default=None,
+                        help="Float32 scaling and configured threads, batch size and XLA (see performance.py).")
+    args = parser.parse_args()
+    main(workers=args.workers, threads_per_worker=args.threads_per_worker,
+         full_retrain=args.full_retrain, finetune_epochs=args.finetune_epochs, store_dir=args.feature_store,
+         multi_ticker=args.multi_ticker, max_epochs=args.max_epochs, patience=args.patience,
+         performance=args.performance)
@@ -1,25 +1,24 @@
-import sqlite3
-import pandas as pd
-import os
+import storage
+from accuracy import read_accuracy
+from instrumentation import MetricsRecorder
 
-def update_readme():
-    db_path = 'predictions/predictions.db'
-    readme_path = 'README.md'
+metrics = MetricsRecorder('update_readme')
 
+def update_readme(db_path='predictions/predictions.db', readme_path='README.md', accuracy_db_path='join_pred.db'):
     # Connect to the database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    conn = storage.connect(db_path, read_only=True)
 
-    # Get the table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
+    # Get the prediction table names
+    tables = storage.list_tables(conn, suffix='_predictions')
 
     readme_content = ""
 
     for table_name in tables:
-        table_name = table_name[0]
         # Read the last 5 rows from each table
-        df = pd.read_sql_query(f"SELECT * FROM {table_name} ORDER BY Datetime DESC LIMIT 5", conn)
+        # Record the ticker table name, as the other stages do
+        with metrics.stage('read', ticker=table_name.replace('_predictions', '')) as m:
+            df = storage.read_latest(conn, table_name, 5)
+            m['rows'] = len(df)
         # Remove duplicates based on the Datetime column
         df = df.drop_duplicates(subset=['Datetime'])
         readme_content += f"## {table_name}\n"
@@ -29,9 +28,23 @@ def update_readme():
     # Close the connection
     conn.close()
 
+    # Rolling Close accuracy per ticker, precomputed by accuracy.py
+    with metrics.stage('read_accuracy') as m:
+        accuracy = read_accuracy(accuracy_db_path)
+        m['rows'] = len(accuracy)
+    if len(accuracy):
+        close = accuracy[accuracy['field'] == 'Close']
+        summary = close.pivot(index='table_name', columns='window', values=['mae', 'rmse', 'hit_rate'])
+        summary.columns = [f'{metric}_{window}' for metric, window in summary.columns]
+        readme_content += "## Close prediction accuracy\n"
+        readme_content += summary.round(4).reset_index().to_markdown(index=False)
+        readme_content += "\n\n"
+
     # Write to README file
-    with open(readme_path, 'w') as f:
-        f.write(readme_content)
+    with metrics.stage('write', rows=len(tables)):
+        with open(readme_path, 'w') as f:
+            f.write(readme_content)
+    metrics.flush()
 
 if __name__ == "__main__":
     update_readme()
@@ -0,0 +1,75 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+def to_float32_matrix(data, columns):
+    """
+    Extract the given columns as a contiguous float32 matrix.
+    Args:
+        data (pd.DataFrame): Source data.
+        columns (list): Columns to extract, in order.
+    Returns:
+        np.ndarray: Array of shape (len(data), len(columns)).
+    """
+    return np.ascontiguousarray(data[columns].to_numpy(dtype=np.float32))
+
+
+def scale_rows(values, scaler, dtype=np.float64):
+    """
+    Apply a fitted MinMaxScaler to the rows of a matrix, the same way
+    scaler.transform does. Only the given rows are copied, so a slice of a
+    memory map can be scaled without reading the rest of it.
+    Args:
+        values (np.ndarray): Matrix of shape (N, F) in the scaler's column order.
+        scaler (MinMaxScaler): Fitted scaler.
+        dtype (type): Dtype the rows are scaled in.
+    Returns:
+        np.ndarray: Scaled float32 matrix of shape (N, F).
+    """
+    scaled = np.array(values, dtype=dtype)
+    scaled *= scaler.scale_
+    scaled += scaler.min_
+    return scaled.astype(np.float32, copy=False)
+
+
+def sliding_windows(values, window, count=None, offset=0):
+    """
+    Build a read-only strided view of consecutive windows over the rows of a matrix.
+    No data is copied: window i is values[offset + i:offset + i + window].
+    Args:
+        values (np.ndarray): Matrix of shape (N, F).
+        window (int): Number of rows per window.
+        count (int): Number of windows to return. Defaults to every full window.
+        offset (int): Row at which the first window starts.
+    Returns:
+        np.ndarray: View of shape (count, window, F).
+    """
+    values = np.ascontiguousarray(values)
+    n_rows, n_features = values.shape
+    available = max(n_rows - offset - window + 1, 0)
+    count = available if count is None else max(min(count, available), 0)
+    row_stride, col_stride = values.strides
+    return as_strided(
+        values[offset:],
+        shape=(count, window, n_features),
+        strides=(row_stride, row_stride, col_stride),
+        writeable=False,
+    )
+
+
+def make_sequences(inputs, outputs, n_steps, n_future):
+    """
+    Pair each input window with the n_future rows that follow it.
+    Args:
+        inputs (np.ndarray): Input feature matrix of shape (N, F_in).
+        outputs (np.ndarray): Target feature matrix of shape (N, F_out).
+        n_steps (int): Number of timesteps in the input sequence.
+        n_future (int): Number of timesteps to predict.
+    Returns:
+        tuple: Views X of shape (M, n_steps, F_in) and y of shape (M, n_future, F_out),
+            where M = N - n_steps - n_future + 1.
+    """
+    count = max(len(inputs) - n_steps - n_future + 1, 0)
+    X = sliding_windows(inputs, n_steps, count=count)
+    y = sliding_windows(outputs, n_future, count=count, offset=n_steps)
+    return X, y